@@ -34,15 +34,12 @@ import streamlit as st
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import plotly.graph_objects as go
-import plotly.express as px
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import hashlib
+from datetime import datetime, timedelta, timezone
 import time
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict, deque
+from functools import lru_cache
 from typing import Tuple, Optional, Dict, List, Any
 import logging
 from datetime import datetime, timedelta
@@ -56,6 +53,33 @@ try:
 except ImportError:
     HAS_AUTOREFRESH = False
 
+# Try to import xxhash for fast alert dedup keys
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+# Try to import numba for JIT-compiled indicator kernels
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """No-op fallback - kernels run as plain Python without numba"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# Streamlit's script context lets worker threads use st.cache_data / session_state
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    HAS_SCRIPT_RUN_CTX = True
+except ImportError:
+    HAS_SCRIPT_RUN_CTX = False
+
 # ============================================================================
 # SAFE UTILITY FUNCTIONS
 # ============================================================================
@@ -159,9 +183,9 @@ st.markdown("""
 def init_session_state():
     """Initialize all session state variables"""
     defaults = {
-        'email_sent_alerts': {},
-        'last_email_time': {},
-        'email_log': [],
+        'email_sent_alerts': OrderedDict(),
+        'last_email_time': OrderedDict(),
+        'email_log': deque(maxlen=50),  # Ring buffer - oldest entries drop off
         'trade_history': [],
         'portfolio_values': [],
         'performance_stats': {
@@ -192,9 +216,11 @@ init_session_state()
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
 def get_ist_now():
-    """Get current IST time"""
-    return datetime.utcnow() + timedelta(hours=5, minutes=30)
+    """Get current IST time (timezone-aware)"""
+    return datetime.now(IST)
 
 def is_market_hours():
     """Check if market is open"""
@@ -232,22 +258,23 @@ def get_market_health():
         if nifty_df.empty:
             return None
         
-        nifty_price = float(nifty_df['Close'].iloc[-1])
-        nifty_prev = float(nifty_df['Close'].iloc[-2]) if len(nifty_df) > 1 else nifty_price
+        nifty_close = nifty_df['Close'].to_numpy(dtype=float)
+        nifty_price = float(nifty_close[-1])
+        nifty_prev = float(nifty_close[-2]) if len(nifty_close) > 1 else nifty_price
         nifty_change = ((nifty_price - nifty_prev) / nifty_prev) * 100
         
-        # Calculate NIFTY indicators
-        nifty_sma20 = nifty_df['Close'].rolling(20).mean().iloc[-1]
-        nifty_sma50 = nifty_df['Close'].rolling(50).mean().iloc[-1] if len(nifty_df) >= 50 else nifty_sma20
-        nifty_rsi = calculate_rsi(nifty_df['Close']).iloc[-1]
+        # Calculate NIFTY indicators (latest bar only - NaN when there are too few bars)
+        nifty_sma20 = nifty_close[-20:].mean() if len(nifty_close) >= 20 else np.nan
+        nifty_sma50 = nifty_close[-50:].mean() if len(nifty_close) >= 50 else nifty_sma20
+        nifty_rsi, _, _ = _latest_rsi_macd(nifty_close)
         
-        if pd.isna(nifty_rsi):
+        if np.isnan(nifty_rsi):
             nifty_rsi = 50
         
         # Get India VIX (Volatility Index)
         vix = yf.Ticker("^INDIAVIX")
         vix_df = vix.history(period="5d")
-        vix_value = float(vix_df['Close'].iloc[-1]) if not vix_df.empty else 15
+        vix_value = float(vix_df['Close'].to_numpy()[-1]) if not vix_df.empty else 15
         
         # Calculate Market Health Score (0-100)
         health_score = 50  # Start neutral
@@ -397,14 +424,15 @@ def detect_emergency_exit(result, market_health):
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # EMERGENCY CONDITION 4: Heavy Selling Volume + Negative
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    volume_pressure = VOLUME_SIGNAL_PRESSURE.get(result['volume_signal'], 0)
     if result['position_type'] == 'LONG':
-        if result['volume_signal'] in ['STRONG_SELLING', 'SELLING']:
+        if volume_pressure < 0:
             if result['volume_ratio'] > 2.5 and result['pnl_percent'] < -1:
                 emergency = True
                 urgency = "HIGH"
                 reasons.append(f"⚠️ Heavy selling volume ({result['volume_ratio']:.1f}x) + Position down")
     else:  # SHORT
-        if result['volume_signal'] in ['STRONG_BUYING', 'BUYING']:
+        if volume_pressure > 0:
             if result['volume_ratio'] > 2.5 and result['pnl_percent'] < -1:
                 emergency = True
                 urgency = "HIGH"
@@ -538,21 +566,22 @@ def detect_chart_patterns(df, current_price):
     if len(df) < 30:
         return patterns
     
-    close = df['Close']
-    high = df['High']
-    low = df['Low']
+    # Pull the columns out once - every pattern below works on these arrays
+    opens = df['Open'].to_numpy(dtype=float)
+    close = df['Close'].to_numpy(dtype=float)
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
     
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # PATTERN 1: DOUBLE TOP (Bearish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-    last_30 = df.tail(30)
-    highs_30 = last_30['High']
+    highs_30 = high[-30:]
+    highs_30 = np.sort(highs_30[~np.isnan(highs_30)])
     
     # Find two highest peaks
-    sorted_highs = highs_30.nlargest(5)
-    if len(sorted_highs) >= 2:
-        peak1 = sorted_highs.iloc[0]
-        peak2 = sorted_highs.iloc[1]
+    if len(highs_30) >= 2:
+        peak1 = highs_30[-1]
+        peak2 = highs_30[-2]
         
         # Check if peaks are similar (within 2%)
         if abs(peak1 - peak2) / peak1 < 0.02:
@@ -570,12 +599,12 @@ def detect_chart_patterns(df, current_price):
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # PATTERN 2: DOUBLE BOTTOM (Bullish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-    lows_30 = last_30['Low']
-    sorted_lows = lows_30.nsmallest(5)
+    lows_30 = low[-30:]
+    lows_30 = np.sort(lows_30[~np.isnan(lows_30)])
     
-    if len(sorted_lows) >= 2:
-        bottom1 = sorted_lows.iloc[0]
-        bottom2 = sorted_lows.iloc[1]
+    if len(lows_30) >= 2:
+        bottom1 = lows_30[0]
+        bottom2 = lows_30[1]
         
         if abs(bottom1 - bottom2) / bottom1 < 0.02:
             if current_price > bottom1 * 1.02:
@@ -588,18 +617,19 @@ def detect_chart_patterns(df, current_price):
                     'action': 'Watch for breakout - potential reversal'
                 })
     
+    # Last two candles, shared by both engulfing checks
+    prev_open, curr_open = opens[-2], opens[-1]
+    prev_close, curr_close = close[-2], close[-1]
+    
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # PATTERN 3: BULLISH ENGULFING (Bullish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     if len(df) >= 2:
-        prev_candle = df.iloc[-2]
-        curr_candle = df.iloc[-1]
-        
         # Previous red, current green, and current engulfs previous
-        if (prev_candle['Close'] < prev_candle['Open'] and
-            curr_candle['Close'] > curr_candle['Open'] and
-            curr_candle['Open'] < prev_candle['Close'] and
-            curr_candle['Close'] > prev_candle['Open']):
+        if (prev_close < prev_open and
+            curr_close > curr_open and
+            curr_open < prev_close and
+            curr_close > prev_open):
             
             patterns.append({
                 'name': 'BULLISH ENGULFING',
@@ -614,13 +644,10 @@ def detect_chart_patterns(df, current_price):
     # PATTERN 4: BEARISH ENGULFING (Bearish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     if len(df) >= 2:
-        prev_candle = df.iloc[-2]
-        curr_candle = df.iloc[-1]
-        
-        if (prev_candle['Close'] > prev_candle['Open'] and
-            curr_candle['Close'] < curr_candle['Open'] and
-            curr_candle['Open'] > prev_candle['Close'] and
-            curr_candle['Close'] < prev_candle['Open']):
+        if (prev_close > prev_open and
+            curr_close < curr_open and
+            curr_open > prev_close and
+            curr_close < prev_open):
             
             patterns.append({
                 'name': 'BEARISH ENGULFING',
@@ -631,20 +658,18 @@ def detect_chart_patterns(df, current_price):
                 'action': 'Potential downward momentum'
             })
     
+    # 20-bar range stats, shared by both triangle checks
+    highs_20 = high[-20:]
+    lows_20 = low[-20:]
+    high_max, high_std = np.nanmax(highs_20), np.nanstd(highs_20, ddof=1)
+    low_min, low_std = np.nanmin(lows_20), np.nanstd(lows_20, ddof=1)
+    
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # PATTERN 5: ASCENDING TRIANGLE (Bullish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     if len(df) >= 20:
-        last_20 = df.tail(20)
-        
-        # Check if highs are flat (resistance)
-        highs_20 = last_20['High']
-        high_max = highs_20.max()
-        high_std = highs_20.std()
-        
-        # Check if lows are rising
-        lows_20 = last_20['Low']
-        low_trend = lows_20.iloc[-5:].mean() > lows_20.iloc[:5].mean()
+        # Highs flat (resistance), lows rising
+        low_trend = np.nanmean(lows_20[-5:]) > np.nanmean(lows_20[:5])
         
         if high_std / high_max < 0.015 and low_trend:  # Flat top + rising lows
             patterns.append({
@@ -660,16 +685,8 @@ def detect_chart_patterns(df, current_price):
     # PATTERN 6: DESCENDING TRIANGLE (Bearish)
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     if len(df) >= 20:
-        last_20 = df.tail(20)
-        
-        # Check if lows are flat (support)
-        lows_20 = last_20['Low']
-        low_min = lows_20.min()
-        low_std = lows_20.std()
-        
-        # Check if highs are falling
-        highs_20 = last_20['High']
-        high_trend = highs_20.iloc[-5:].mean() < highs_20.iloc[:5].mean()
+        # Lows flat (support), highs falling
+        high_trend = np.nanmean(highs_20[-5:]) < np.nanmean(highs_20[:5])
         
         if low_std / low_min < 0.015 and high_trend:  # Flat bottom + falling highs
             patterns.append({
@@ -683,13 +700,106 @@ def detect_chart_patterns(df, current_price):
     
     return patterns
 
-def send_email_alert(subject, html_content, sender, password, recipient):
+class _SMTPPool:
     """
-    Send email alert - Returns (success, message)
+    Keeps authenticated SMTP sessions open between alert sends.
+    Idle sessions are health-checked with NOOP and re-opened if the server dropped them.
+    Sessions are keyed by a salted digest of the credentials - the pool is shared by
+    every browser session, so the password itself is never stored.
     """
-    if not sender or not password or not recipient:
-        log_email("❌ Missing email credentials")
-        return False, "Missing email credentials"
+    
+    def __init__(self, host="smtp.gmail.com", port=587, max_idle=4):
+        import os
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._salt = os.urandom(16)
+    
+    def _key(self, sender, password):
+        """Pool key for a sender/password pair"""
+        import hashlib
+        import hmac
+        return hmac.new(self._salt, f"{sender}\0{password}".encode(), hashlib.sha256).digest()
+    
+    def _connect(self, sender, password):
+        import smtplib
+        server = smtplib.SMTP(self.host, self.port, timeout=10)  # ✅ Add timeout
+        server.starttls()
+        server.login(sender, password)
+        return server
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+    
+    def _acquire(self, sender, password):
+        """Reuse a live idle session or open a new one"""
+        import smtplib
+        key = self._key(sender, password)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                server = idle.pop() if idle else None
+            
+            if server is None:
+                return self._connect(sender, password)
+            
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+    
+    def _release(self, sender, password, server):
+        with self._lock:
+            idle = self._idle.setdefault(self._key(sender, password), [])
+            if len(idle) < self.max_idle:
+                idle.append(server)
+                return
+        self._close(server)
+    
+    def send_many(self, sender, password, recipient, messages):
+        """Send several messages over one authenticated session"""
+        import smtplib
+        server = self._acquire(sender, password)
+        try:
+            for message in messages:
+                try:
+                    server.sendmail(sender, recipient, message)
+                except smtplib.SMTPServerDisconnected:
+                    # Dropped between health check and send - reconnect once
+                    self._close(server)
+                    server = self._connect(sender, password)
+                    server.sendmail(sender, recipient, message)
+        except Exception:
+            self._close(server)
+            raise
+        self._release(sender, password, server)
+    
+    def send(self, sender, password, recipient, message):
+        """Send a single message"""
+        self.send_many(sender, password, recipient, [message])
+
+@st.cache_resource
+def get_smtp_pool():
+    """Process-wide SMTP pool - survives Streamlit reruns"""
+    return _SMTPPool()
+
+def _deliver_email(pool, subject, html_content, sender, password, recipient):
+    """
+    Build and send one email without touching session state (safe in worker threads)
+    Returns: (success, message, log_line)
+    """
+    # Imported lazily - sessions without email never pay for these
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
     
     try:
         msg = MIMEMultipart('alternative')
@@ -698,40 +808,81 @@ def send_email_alert(subject, html_content, sender, password, recipient):
         msg['To'] = recipient
         msg.attach(MIMEText(html_content, 'html'))
         
-        server = smtplib.SMTP("smtp.gmail.com", 587, timeout=10)  # ✅ Add timeout
-        server.starttls()
-        server.login(sender, password)
-        server.sendmail(sender, recipient, msg.as_string())
-        server.quit()
-        
-        log_email(f"✅ Email sent: {subject}")  # ✅ Add logging
-        return True, "Email sent successfully"
+        # Reuses an already authenticated session when one is available
+        pool.send(sender, password, recipient, msg.as_string())
+        return True, "Email sent successfully", f"✅ Email sent: {subject}"
     
     except smtplib.SMTPAuthenticationError:
-        log_email("❌ SMTP Authentication failed")
-        return False, "Authentication failed - check App Password"
+        return False, "Authentication failed - check App Password", "❌ SMTP Authentication failed"
     except smtplib.SMTPRecipientsRefused:
-        log_email("❌ Invalid recipient email")
-        return False, "Invalid recipient email address"
+        return False, "Invalid recipient email address", "❌ Invalid recipient email"
     except smtplib.SMTPException as e:
-        log_email(f"❌ SMTP error: {str(e)}")
-        return False, f"SMTP error: {str(e)}"
+        return False, f"SMTP error: {str(e)}", f"❌ SMTP error: {str(e)}"
     except Exception as e:
-        log_email(f"❌ Email failed: {str(e)}")
-        return False, f"Email failed: {str(e)}"
+        return False, f"Email failed: {str(e)}", f"❌ Email failed: {str(e)}"
+
+def send_email_alert(subject, html_content, sender, password, recipient):
+    """
+    Send email alert - Returns (success, message)
+    """
+    if not sender or not password or not recipient:
+        log_email("❌ Missing email credentials")
+        return False, "Missing email credentials"
+    
+    success, message, log_line = _deliver_email(
+        get_smtp_pool(), subject, html_content, sender, password, recipient
+    )
+    log_email(log_line)  # ✅ Add logging
+    return success, message
+
+def send_email_alerts_batch(jobs, sender, password, recipient, max_workers=4):
+    """
+    Send several emails concurrently - SMTP round-trips overlap instead of queueing
+    jobs: list of (subject, html_content)
+    Returns: list of (success, message) in job order
+    """
+    if not jobs:
+        return []
+    
+    if not sender or not password or not recipient:
+        log_email("❌ Missing email credentials")
+        return [(False, "Missing email credentials")] * len(jobs)
+    
+    pool = get_smtp_pool()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        outcomes = list(executor.map(
+            lambda job: _deliver_email(pool, job[0], job[1], sender, password, recipient),
+            jobs
+        ))
+    
+    # Log from the script thread - session state is not available to workers
+    for _, _, log_line in outcomes:
+        log_email(log_line)
+    
+    return [(success, message) for success, message, _ in outcomes]
     
 
 def log_email(message):
     """Add to email log"""
-    timestamp = get_ist_now().strftime("%H:%M:%S")
+    timestamp = f"{get_ist_now():%H:%M:%S}"
     st.session_state.email_log.append(f"[{timestamp}] {message}")
-    if len(st.session_state.email_log) > 50:
-        st.session_state.email_log = st.session_state.email_log[-50:]
 
-def generate_alert_hash(ticker, alert_type, key_value=""):
-    """Generate unique hash for an alert"""
-    alert_string = f"{ticker}_{alert_type}_{key_value}_{get_ist_now().strftime('%Y%m%d')}"
-    return hashlib.md5(alert_string.encode()).hexdigest()[:12]
+def _fast_hash(text):
+    """Non-cryptographic 12-char hex digest - alert hashes are only dedup keys"""
+    if HAS_XXHASH:
+        return xxhash.xxh3_64(text.encode()).hexdigest()[:12]
+    # Built-in hash is per-process, which is fine for keys held in session state
+    return format(hash(text) & 0xFFFFFFFFFFFF, '012x')
+
+def generate_alert_hash(ticker, alert_type, key_value="", day=None):
+    """
+    Generate unique hash for an alert
+    day: IST date stamp (YYYYMMDD) - pass it in when hashing many alerts at once
+    """
+    if day is None:
+        day = f"{get_ist_now():%Y%m%d}"
+    alert_string = f"{ticker}_{alert_type}_{key_value}_{day}"
+    return _fast_hash(alert_string)
 
 
 def can_send_email(alert_hash, cooldown_minutes=15):
@@ -769,10 +920,23 @@ def can_send_email(alert_hash, cooldown_minutes=15):
         return True  # Allow email on error
     
 
+MAX_EMAIL_HASHES = 1000
 def mark_email_sent(alert_hash):
-    """Mark an alert as sent"""
-    st.session_state.last_email_time[alert_hash] = datetime.now()  # ✅ Use datetime.now()
-    st.session_state.email_sent_alerts[alert_hash] = True
+    """Mark an alert as sent (oldest entries evicted beyond MAX_EMAIL_HASHES)"""
+    last_email_time = st.session_state.last_email_time
+    sent_alerts = st.session_state.email_sent_alerts
+    
+    if alert_hash in last_email_time:
+        last_email_time.move_to_end(alert_hash)
+    last_email_time[alert_hash] = datetime.now()  # ✅ Use datetime.now()
+    if len(last_email_time) > MAX_EMAIL_HASHES:
+        last_email_time.popitem(last=False)
+    
+    if alert_hash in sent_alerts:
+        sent_alerts.move_to_end(alert_hash)
+    sent_alerts[alert_hash] = True
+    if len(sent_alerts) > MAX_EMAIL_HASHES:
+        sent_alerts.popitem(last=False)
     logger.info(f"Email marked sent: {alert_hash} at {datetime.now().strftime('%H:%M:%S')}")
 
 MAX_TRADE_HISTORY = 500
@@ -864,22 +1028,43 @@ def update_drawdown(current_portfolio_value):
         if len(st.session_state.drawdown_history) > 1000:
             st.session_state.drawdown_history = st.session_state.drawdown_history[-1000:]
 
+# Positions are analysed on worker threads - the limiter's bookkeeping is shared
+_RATE_LIMIT_LOCK = threading.Lock()
+
 def rate_limited_api_call(ticker, min_interval=1.0):
-    """Ensure minimum interval between API calls"""
-    current_time = time.time()
-    
-    if ticker in st.session_state.last_api_call:
-        elapsed = current_time - st.session_state.last_api_call[ticker]
-        if elapsed < min_interval:
-            time.sleep(min_interval - elapsed)
-    
-    st.session_state.last_api_call[ticker] = time.time()
-    st.session_state.api_call_count += 1
+    """Ensure minimum interval between API calls (thread-safe)"""
+    with _RATE_LIMIT_LOCK:
+        current_time = time.time()
+        last_call = st.session_state.last_api_call.get(ticker)
+        wait = max(0.0, last_call + min_interval - current_time) if last_call is not None else 0.0
+        
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        st.session_state.last_api_call[ticker] = current_time + wait
+        st.session_state.api_call_count += 1
+    
+    if wait > 0:
+        time.sleep(wait)
     return True
 
+def downcast_volume(df):
+    """
+    Store Volume as int32 in cached frames. OHLC stays float64 - SL/target
+    hits compare those prices against the user's float64 levels.
+    """
+    # int32 tops out at ~2.1B shares - keep int64 for anything larger
+    if 'Volume' in df.columns and df['Volume'].max() < np.iinfo(np.int32).max:
+        return df.astype({'Volume': 'int32'}, copy=False)
+    return df
+
+@lru_cache(maxsize=1024)
+def yahoo_symbol(ticker, suffixes=('.NS',)):
+    """Yahoo symbol for a portfolio ticker - bare tickers default to NSE (memoised per ticker)"""
+    ticker = str(ticker)
+    return ticker if ticker.endswith(suffixes) else f"{ticker}.NS"
+
 def get_stock_data_safe(ticker, period="6mo"):
     """Safely fetch stock data with rate limiting"""
-    symbol = ticker if '.NS' in str(ticker) or '.BO' in str(ticker) else f"{ticker}.NS"
+    symbol = yahoo_symbol(ticker, ('.NS', '.BO'))
     max_retries = 3
     
     for attempt in range(max_retries):
@@ -890,7 +1075,7 @@ def get_stock_data_safe(ticker, period="6mo"):
             
             if not df.empty:
                 df.reset_index(inplace=True)
-                return df
+                return downcast_volume(df)
                 
         except Exception as e:
             if attempt < max_retries - 1:
@@ -901,6 +1086,35 @@ def get_stock_data_safe(ticker, period="6mo"):
     
     return None
 
+# Buckets roll every PRICE_REFRESH_SECONDS in session and each entry is the whole
+# portfolio's 6mo history - keep only the last few instead of ~25 min of stale ones
+@st.cache_data(ttl=86400, max_entries=4)
+def fetch_portfolio_history(tickers, period="6mo", cache_bucket=None):
+    """
+    Daily history for every portfolio ticker in one batched download, shaped
+    like get_stock_data_safe output. Keyed on tickers/period/cache_bucket only,
+    so reruns inside one bucket reuse the download.
+    Returns: {ticker: df} - tickers missing here fall back to per-ticker fetches
+    """
+    symbols = {ticker: yahoo_symbol(ticker, ('.NS', '.BO')) for ticker in tickers}
+    if not symbols:
+        return {}
+    
+    try:
+        bars = _download_mtf_batch(tuple(sorted(set(symbols.values()))), period, "1d")
+    except Exception as e:
+        logger.error(f"Batch history download failed: {str(e)}")
+        return {}
+    
+    history = {}
+    for ticker, symbol in symbols.items():
+        symbol_df = bars.get(symbol)
+        if symbol_df is not None:
+            symbol_df = symbol_df.dropna()
+            if not symbol_df.empty:
+                history[ticker] = downcast_volume(symbol_df.reset_index())
+    return history
+
 def calculate_holding_period(entry_date):
     """Calculate holding period in days with multiple format support"""
     if entry_date is None or entry_date == '' or (isinstance(entry_date, float) and pd.isna(entry_date)):
@@ -969,20 +1183,171 @@ def get_tax_implication(holding_days, pnl):
 # TECHNICAL ANALYSIS FUNCTIONS
 # ============================================================================
 
+def get_ohlcv_arrays(df):
+    """
+    Extract Close/High/Low/Volume as numpy arrays once per DataFrame
+    Returns: close, high, low, volume (volume is None if not available)
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
+    volume = df['Volume'].to_numpy(dtype=float) if 'Volume' in df.columns else None
+    return close, high, low, volume
+
+@njit(cache=True)
+def _wilder(x, period):
+    """
+    Wilder smoothing matching Series.ewm(alpha=1/period, adjust=False,
+    min_periods=period).mean(), including its NaN handling
+    """
+    alpha = 1.0 / period
+    out = np.empty(len(x))
+    weighted = np.nan
+    old_wt = 1.0
+    nobs = 0
+    for i in range(len(x)):
+        if x[i] == x[i]:
+            nobs += 1
+        weighted, old_wt = _ewm_step(weighted, old_wt, x[i], alpha)
+        out[i] = weighted if nobs >= period else np.nan
+    return out
+
 def calculate_rsi(prices: pd.Series, period: int = 14) -> pd.Series:
     """Calculate RSI using Wilder's smoothing method"""
-    delta = prices.diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
+    values = prices.to_numpy(dtype=float)
+    delta = np.empty_like(values)
+    delta[:1] = np.nan
+    delta[1:] = values[1:] - values[:-1]
     
-    # Use Wilder's smoothing (EWM with alpha = 1/period)
-    avg_gain = gain.ewm(alpha=1/period, min_periods=period, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/period, min_periods=period, adjust=False).mean()
+    # fmax maps the NaN first delta to 0, same as .where(delta > 0, 0)
+    avg_gain = _wilder(np.fmax(delta, 0.0), period)
+    avg_loss = _wilder(np.fmax(-delta, 0.0), period)
     
     # Handle division by zero
-    rs = avg_gain / avg_loss.replace(0, np.finfo(float).eps)
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    rs = avg_gain / np.where(avg_loss == 0, np.finfo(float).eps, avg_loss)
+    return pd.Series(100 - (100 / (1 + rs)), index=prices.index)
+
+@njit(cache=True)
+def _ewm_step(weighted, old_wt, cur, alpha):
+    """
+    One Series.ewm(adjust=False) update, NaN handling included (gaps decay
+    the previous weight). Returns: weighted, old_wt
+    """
+    if weighted == weighted:
+        old_wt *= 1.0 - alpha
+        if cur == cur:
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    elif cur == cur:
+        weighted = cur
+    return weighted, old_wt
+
+@njit(cache=True)
+def _span_alpha(span):
+    """Same span -> alpha conversion as pandas"""
+    return 1.0 / (1.0 + (span - 1) / 2.0)
+
+@njit(cache=True)
+def _ema(x, span):
+    """EMA recurrence matching Series.ewm(span=span, adjust=False).mean()"""
+    alpha = _span_alpha(span)
+    out = np.empty_like(x)
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(len(x)):
+        weighted, old_wt = _ewm_step(weighted, old_wt, x[i], alpha)
+        out[i] = weighted
+    return out
+
+@njit(cache=True)
+def _macd(x, fast, slow, signal):
+    """
+    MACD line, signal and histogram in one pass - the fast, slow and signal
+    EMAs advance together instead of three separate sweeps over the closes.
+    Returns: macd, signal_line, histogram (matching the chained pandas EMAs)
+    """
+    fast_alpha = _span_alpha(fast)
+    slow_alpha = _span_alpha(slow)
+    signal_alpha = _span_alpha(signal)
+    n = len(x)
+    macd = np.empty(n)
+    signal_line = np.empty(n)
+    hist = np.empty(n)
+    ema_fast = ema_slow = ema_signal = np.nan
+    fast_wt = slow_wt = signal_wt = 1.0
+    for i in range(n):
+        ema_fast, fast_wt = _ewm_step(ema_fast, fast_wt, x[i], fast_alpha)
+        ema_slow, slow_wt = _ewm_step(ema_slow, slow_wt, x[i], slow_alpha)
+        macd[i] = ema_fast - ema_slow
+        ema_signal, signal_wt = _ewm_step(ema_signal, signal_wt, macd[i], signal_alpha)
+        signal_line[i] = ema_signal
+        hist[i] = macd[i] - ema_signal
+    return macd, signal_line, hist
+
+@njit(cache=True)
+def _last_ema(x, span):
+    """
+    Last value of Series.ewm(span=span).mean() (pandas default adjust=True)
+    without building the whole EMA series
+    """
+    alpha = _span_alpha(span)
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(len(x)):
+        cur = x[i]
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + cur) / (old_wt + 1.0)
+                old_wt += 1.0
+        elif cur == cur:
+            weighted = cur
+    return weighted
+
+@njit(cache=True)
+def _ewm_last(x, alpha):
+    """Last value of Series.ewm(alpha=alpha, adjust=False).mean(), NaN gaps as in pandas"""
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(len(x)):
+        weighted, old_wt = _ewm_step(weighted, old_wt, x[i], alpha)
+    return weighted
+
+@njit(cache=True)
+def _latest_rsi_macd(values, rsi_period=14, fast=12, slow=26, signal=9):
+    """
+    Latest RSI and last two MACD histogram values for one close series,
+    matching calculate_rsi / calculate_macd without building any Series.
+    Returns: rsi, macd_hist, macd_hist_prev (NaN where there are too few bars)
+    """
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan, np.nan
+    
+    # RSI - Wilder smoothing of gains/losses (first bar and NaN moves count as 0)
+    rsi = np.nan
+    if n >= rsi_period:
+        gains = np.zeros(n)
+        losses = np.zeros(n)
+        for i in range(1, n):
+            delta = values[i] - values[i - 1]
+            if delta > 0:
+                gains[i] = delta
+            elif delta < 0:
+                losses[i] = -delta
+        avg_gain = _ewm_last(gains, 1.0 / rsi_period)
+        avg_loss = _ewm_last(losses, 1.0 / rsi_period)
+        if avg_loss == 0:
+            avg_loss = np.finfo(np.float64).eps
+        rsi = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    
+    # MACD histogram - only the last two bars are needed
+    hist = _macd(values, fast, slow, signal)[2]
+    macd_hist_prev = hist[n - 2] if n > 1 else np.nan
+    
+    return rsi, hist[n - 1], macd_hist_prev
 
 def calculate_macd(
     prices: pd.Series, 
@@ -991,23 +1356,26 @@ def calculate_macd(
     signal: int = 9
 ) -> Tuple[pd.Series, pd.Series, pd.Series]:
     """Calculate MACD (Moving Average Convergence Divergence)"""
-    exp_fast = prices.ewm(span=fast, adjust=False).mean()
-    exp_slow = prices.ewm(span=slow, adjust=False).mean()
-    macd = exp_fast - exp_slow
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    histogram = macd - signal_line
+    macd_values, signal_values, hist_values = _macd(prices.to_numpy(dtype=float), fast, slow, signal)
+    
+    macd = pd.Series(macd_values, index=prices.index, name=prices.name)
+    signal_line = pd.Series(signal_values, index=prices.index, name=prices.name)
+    histogram = pd.Series(hist_values, index=prices.index, name=prices.name)
     return macd, signal_line, histogram
 
 def calculate_atr(high, low, close, period=14):
     """Calculate ATR using Wilder's smoothing"""
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    high_arr = high.to_numpy(dtype=float)
+    low_arr = low.to_numpy(dtype=float)
+    close_arr = close.to_numpy(dtype=float)
     
-    # Use Wilder's smoothing
-    atr = tr.ewm(alpha=1/period, min_periods=period, adjust=False).mean()
-    return atr
+    prev_close = np.empty_like(close_arr)
+    prev_close[:1] = np.nan
+    prev_close[1:] = close_arr[:-1]
+    
+    # True range - fmax skips the missing previous close on the first bar
+    tr = np.fmax(np.fmax(high_arr - low_arr, np.abs(high_arr - prev_close)), np.abs(low_arr - prev_close))
+    return pd.Series(_wilder(tr, period), index=high.index)
 
 def calculate_bollinger_bands(prices, period=20, std_dev=2):
     """Calculate Bollinger Bands"""
@@ -1017,40 +1385,23 @@ def calculate_bollinger_bands(prices, period=20, std_dev=2):
     lower = sma - (std * std_dev)
     return upper, sma, lower
 
+def bollinger_last(prices, period=20, std_dev=2):
+    """Latest Bollinger Bands only - (upper, middle, lower) from the last period bars, NaN if too short"""
+    window = np.asarray(prices, dtype=float)[-period:]
+    if len(window) < period or np.isnan(window).any():
+        return np.nan, np.nan, np.nan
+    sma = window.mean()
+    std = window.std(ddof=1)
+    return sma + (std * std_dev), sma, sma - (std * std_dev)
+
 def calculate_ema(prices, period):
     """Calculate Exponential Moving Average"""
-    return prices.ewm(span=period, adjust=False).mean()
+    return pd.Series(_ema(prices.to_numpy(dtype=float), period), index=prices.index, name=prices.name)
 
 def calculate_sma(prices, period):
     """Calculate Simple Moving Average"""
     return prices.rolling(window=period).mean()
 
-def calculate_adx(high, low, close, period=14):
-    """Calculate ADX correctly"""
-    # True Range
-    tr1 = high - low
-    tr2 = abs(high - close.shift())
-    tr3 = abs(low - close.shift())
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    # Directional Movement
-    up_move = high - high.shift()
-    down_move = low.shift() - low  # ✅ FIXED
-    
-    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0)
-    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0)
-    
-    # Wilder's smoothing
-    alpha = 1/period
-    atr = tr.ewm(alpha=alpha, min_periods=period, adjust=False).mean()
-    plus_di = 100 * pd.Series(plus_dm).ewm(alpha=alpha, adjust=False).mean() / atr
-    minus_di = 100 * pd.Series(minus_dm).ewm(alpha=alpha, adjust=False).mean() / atr
-    
-    dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di + 1e-10)
-    adx = dx.ewm(alpha=alpha, min_periods=period, adjust=False).mean()
-    
-    return adx
-
 def calculate_stochastic(high, low, close, k_period=14, d_period=3):
     """Calculate Stochastic Oscillator"""
     lowest_low = low.rolling(window=k_period).min()
@@ -1062,56 +1413,175 @@ def calculate_stochastic(high, low, close, k_period=14, d_period=3):
     
     return k, d
 
+# ============================================================================
+# FUSED INDICATOR KERNEL
+# ============================================================================
+
+@njit(cache=True)
+def compute_all_indicators(close, high, low, rsi_period=14, macd_fast=12,
+                           macd_slow=26, macd_signal=9, atr_period=14,
+                           stoch_k_period=14, stoch_d_period=3):
+    """
+    Single pass over the bars computing the latest RSI, last two MACD histogram
+    bars, ATR and Stochastic %K/%D. Matches calculate_rsi / calculate_macd /
+    calculate_atr / calculate_stochastic (Wilder smoothing, adjust=False EMAs).
+    Returns NaN where there are not enough bars.
+    Returns: rsi, macd_hist, macd_hist_prev, atr, stoch_k, stoch_d
+    """
+    n = len(close)
+    if n == 0:
+        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+    
+    rsi_alpha = 1.0 / rsi_period
+    atr_alpha = 1.0 / atr_period
+    fast_alpha = 2.0 / (macd_fast + 1)
+    slow_alpha = 2.0 / (macd_slow + 1)
+    signal_alpha = 2.0 / (macd_signal + 1)
+    
+    avg_gain = 0.0
+    avg_loss = 0.0
+    ema_fast = close[0]
+    ema_slow = close[0]
+    signal_line = 0.0
+    macd_hist = 0.0
+    macd_hist_prev = np.nan
+    atr = high[0] - low[0]
+    
+    for i in range(1, n):
+        # RSI - Wilder smoothed gains/losses
+        delta = close[i] - close[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        avg_gain += rsi_alpha * (gain - avg_gain)
+        avg_loss += rsi_alpha * (loss - avg_loss)
+        
+        # MACD - fast/slow EMAs and signal line
+        ema_fast += fast_alpha * (close[i] - ema_fast)
+        ema_slow += slow_alpha * (close[i] - ema_slow)
+        signal_line += signal_alpha * ((ema_fast - ema_slow) - signal_line)
+        macd_hist_prev = macd_hist
+        macd_hist = (ema_fast - ema_slow) - signal_line
+        
+        # ATR - Wilder smoothed true range
+        tr = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        atr += atr_alpha * (tr - atr)
+    
+    if n >= rsi_period:
+        rs = avg_gain / (avg_loss if avg_loss != 0 else np.finfo(np.float64).eps)
+        rsi = 100.0 - (100.0 / (1.0 + rs))
+    else:
+        rsi = np.nan
+    
+    if n < atr_period:
+        atr = np.nan
+    
+    # Stochastic - only the last d_period %K windows are needed for %D
+    stoch_k = np.nan
+    stoch_d = np.nan
+    if n >= stoch_k_period:
+        eps = np.finfo(np.float64).eps
+        k_sum = 0.0
+        k_count = 0
+        for j in range(max(stoch_k_period - 1, n - stoch_d_period), n):
+            lowest = low[j - stoch_k_period + 1:j + 1].min()
+            highest = high[j - stoch_k_period + 1:j + 1].max()
+            stoch_k = 100.0 * (close[j] - lowest) / (highest - lowest + eps)
+            k_sum += stoch_k
+            k_count += 1
+        if k_count == stoch_d_period:
+            stoch_d = k_sum / k_count
+    
+    return rsi, macd_hist, macd_hist_prev, atr, stoch_k, stoch_d
+
+# NaN fallbacks for compute_all_indicators' rsi, macd_hist, stoch_k, stoch_d
+INDICATOR_NAN_DEFAULTS = np.array([50.0, 0.0, 50.0, 50.0])
+
+def get_indicator_snapshot(close, latest=None):
+    """
+    Latest-bar indicator values shared by the momentum, SL risk, upside and
+    MTF scorers, so a close series only goes through RSI/MACD once.
+    latest: (rsi, macd_hist, macd_hist_prev) already taken from compute_all_indicators
+    Returns: dict with rsi, macd_hist, macd_hist_prev, sma_20, sma_50, ema_9, ema_21
+    """
+    prices = close.to_numpy(dtype=float)
+    
+    # RSI and last two MACD histogram bars in one kernel call, NaN -> neutral (50 / 0)
+    if latest is None:
+        latest = _latest_rsi_macd(prices)
+    latest = np.array(latest)
+    rsi, macd_hist, macd_hist_prev = np.where(np.isnan(latest), (50, 0, 0), latest).tolist()
+    
+    sma_20 = prices[-20:].mean() if len(prices) >= 20 else close.mean()
+    
+    return {
+        'rsi': rsi,
+        'macd_hist': macd_hist,
+        'macd_hist_prev': macd_hist_prev,
+        'sma_20': sma_20,
+        'sma_50': prices[-50:].mean() if len(prices) >= 50 else sma_20,
+        'ema_9': _last_ema(prices, 9),
+        'ema_21': _last_ema(prices, 21) if len(prices) >= 21 else close.mean()
+    }
+
 # ============================================================================
 # VOLUME ANALYSIS
 # ============================================================================
 
+# (price direction, volume bucket) -> signal, description template.
+# Buckets: 0 = below 0.7x, 1 = 0.7-1.0x, 2 = 1.0-1.5x, 3 = above 1.5x avg volume
+VOLUME_SIGNALS = {
+    (1, 3): ("STRONG_BUYING", "Strong buying pressure ({:.1f}x avg volume)"),
+    (1, 2): ("BUYING", "Buying with good volume ({:.1f}x)"),
+    (1, 0): ("WEAK_BUYING", "Weak rally, low volume ({:.1f}x)"),
+    (-1, 3): ("STRONG_SELLING", "Strong selling pressure ({:.1f}x avg volume)"),
+    (-1, 2): ("SELLING", "Selling with volume ({:.1f}x)"),
+    (-1, 0): ("WEAK_SELLING", "Weak decline, low volume ({:.1f}x)"),
+}
+VOLUME_SIGNAL_NEUTRAL = ("NEUTRAL", "Normal volume ({:.1f}x)")
+# Signal -> signed pressure code (+ buying / - selling, 2 = strong); weak/neutral signals are 0
+VOLUME_SIGNAL_PRESSURE = {'STRONG_BUYING': 2, 'BUYING': 1, 'SELLING': -1, 'STRONG_SELLING': -2}
+
 def analyze_volume(df):
+    """DataFrame wrapper around analyze_volume_arrays"""
+    close, _, _, volume = get_ohlcv_arrays(df)
+    return analyze_volume_arrays(close, volume)
+
+def analyze_volume_arrays(close, volume):
     """
     Analyze volume to confirm price movements
     Returns: volume_signal, volume_ratio, description, volume_trend
     """
-    if 'Volume' not in df.columns or len(df) < 20:
+    if volume is None or len(volume) < 20:
         return "NEUTRAL", 1.0, "Volume data not available", "NEUTRAL"
     
-    if df['Volume'].iloc[-1] == 0:
+    current_volume = volume[-1]
+    if current_volume == 0:
         return "NEUTRAL", 1.0, "No volume data", "NEUTRAL"
     
-    # Calculate average volume (20-day)
-    avg_volume = df['Volume'].rolling(20).mean().iloc[-1]
-    current_volume = df['Volume'].iloc[-1]
+    # Calculate average volume (20-day) - the 5-day window reuses the same tail
+    recent_volume = volume[-20:]
+    avg_volume = recent_volume.mean()
     volume_ratio = current_volume / avg_volume if avg_volume > 0 else 1.0
     
     # Get price direction
-    price_change = df['Close'].iloc[-1] - df['Close'].iloc[-2]
+    price_change = close[-1] - close[-2]
     
     # Volume trend (is volume increasing?)
-    vol_5d = df['Volume'].tail(5).mean()
-    vol_20d = df['Volume'].tail(20).mean()
-    volume_trend = "INCREASING" if vol_5d > vol_20d else "DECREASING"
-    
-    # Determine signal
-    if price_change > 0 and volume_ratio > 1.5:
-        signal = "STRONG_BUYING"
-        desc = f"Strong buying pressure ({volume_ratio:.1f}x avg volume)"
-    elif price_change > 0 and volume_ratio > 1.0:
-        signal = "BUYING"
-        desc = f"Buying with good volume ({volume_ratio:.1f}x)"
-    elif price_change > 0 and volume_ratio < 0.7:
-        signal = "WEAK_BUYING"
-        desc = f"Weak rally, low volume ({volume_ratio:.1f}x)"
-    elif price_change < 0 and volume_ratio > 1.5:
-        signal = "STRONG_SELLING"
-        desc = f"Strong selling pressure ({volume_ratio:.1f}x avg volume)"
-    elif price_change < 0 and volume_ratio > 1.0:
-        signal = "SELLING"
-        desc = f"Selling with volume ({volume_ratio:.1f}x)"
-    elif price_change < 0 and volume_ratio < 0.7:
-        signal = "WEAK_SELLING"
-        desc = f"Weak decline, low volume ({volume_ratio:.1f}x)"
+    vol_5d = recent_volume[-5:].mean()
+    volume_trend = "INCREASING" if vol_5d > avg_volume else "DECREASING"
+    
+    # Determine signal - price direction (-1/0/+1) x volume bucket lookup
+    direction = int(price_change > 0) - int(price_change < 0)
+    if volume_ratio > 1.5:
+        bucket = 3
+    elif volume_ratio > 1.0:
+        bucket = 2
+    elif volume_ratio < 0.7:
+        bucket = 0
     else:
-        signal = "NEUTRAL"
-        desc = f"Normal volume ({volume_ratio:.1f}x)"
+        bucket = 1
+    signal, desc_template = VOLUME_SIGNALS.get((direction, bucket), VOLUME_SIGNAL_NEUTRAL)
+    desc = desc_template.format(volume_ratio)
     
     return signal, volume_ratio, desc, volume_trend
 
@@ -1119,116 +1589,139 @@ def analyze_volume(df):
 # SUPPORT/RESISTANCE DETECTION
 # ============================================================================
 
+def default_sr_levels(current_price):
+    """Fallback levels (±5%) when there is not enough data to detect pivots"""
+    return {
+        'support_levels': [],
+        'resistance_levels': [],
+        'nearest_support': current_price * 0.95,
+        'nearest_resistance': current_price * 1.05,
+        'distance_to_support': 5.0,
+        'distance_to_resistance': 5.0,
+        'support_strength': 'WEAK',
+        'resistance_strength': 'WEAK',
+        'support_touches': 0,
+        'resistance_touches': 0,
+        'psychological_levels': []
+    }
+
+@njit(cache=True)
+def _cluster_levels(prices, weights, threshold_pct=1.5):
+    """
+    Cluster sorted pivot prices - a pivot joins the current cluster while it is
+    within threshold_pct of the cluster's mean price.
+    Returns: weighted mean price, touch count, total weight (one entry per cluster)
+    """
+    n = len(prices)
+    out_prices = np.empty(n)
+    out_touches = np.empty(n, dtype=np.int64)
+    out_weights = np.empty(n)
+    k = 0
+    
+    price_sum = prices[0]
+    weighted_sum = prices[0] * weights[0]
+    weight_sum = weights[0]
+    count = 1
+    
+    for i in range(1, n):
+        center = price_sum / count
+        if (prices[i] - center) / center * 100 < threshold_pct:
+            price_sum += prices[i]
+            weighted_sum += prices[i] * weights[i]
+            weight_sum += weights[i]
+            count += 1
+        else:
+            out_prices[k] = weighted_sum / weight_sum
+            out_touches[k] = count
+            out_weights[k] = weight_sum
+            k += 1
+            
+            price_sum = prices[i]
+            weighted_sum = prices[i] * weights[i]
+            weight_sum = weights[i]
+            count = 1
+    
+    # Last cluster
+    out_prices[k] = weighted_sum / weight_sum
+    out_touches[k] = count
+    out_weights[k] = weight_sum
+    k += 1
+    
+    return out_prices[:k], out_touches[:k], out_weights[:k]
+
+def find_pivot_indices(values, order=3, highs=True):
+    """
+    Indices of pivot bars - bar i is a pivot high (low) when it is the max (min)
+    of bars i-order .. i+order, ties included. Bars next to a NaN are never pivots.
+    """
+    width = 2 * order + 1
+    if len(values) < width:
+        return np.empty(0, dtype=np.int64)
+    
+    # One sliding-window reduction instead of 2*order shifted comparisons
+    windows = np.lib.stride_tricks.sliding_window_view(values, width)
+    centre = values[order:len(values) - order]
+    if highs:
+        is_pivot = centre >= windows.max(axis=1)
+    else:
+        is_pivot = centre <= windows.min(axis=1)
+    return np.flatnonzero(is_pivot) + order
+
 def find_support_resistance(df, lookback=60):
+    """DataFrame wrapper around find_support_resistance_arrays"""
+    # Only the lookback window is used - convert just those rows
+    close, high, low, volume = get_ohlcv_arrays(df.tail(lookback))
+    return find_support_resistance_arrays(close, high, low, volume, lookback)
+
+def find_support_resistance_arrays(close, high, low, volume=None, lookback=60):
     """
     Find key support and resistance levels using multiple methods.
     Uses pivot points, volume profile, and clustering.
     """
-    if len(df) < lookback:
-        lookback = len(df)
+    if len(close) < lookback:
+        lookback = len(close)
     
     if lookback < 10:
-        current_price = df['Close'].iloc[-1]
-        return {
-            'support_levels': [],
-            'resistance_levels': [],
-            'nearest_support': current_price * 0.95,
-            'nearest_resistance': current_price * 1.05,
-            'distance_to_support': 5.0,
-            'distance_to_resistance': 5.0,
-            'support_strength': 'WEAK',
-            'resistance_strength': 'WEAK',
-            'support_touches': 0,
-            'resistance_touches': 0,
-            'psychological_levels': []
-        }
+        return default_sr_levels(close[-1])
     
-    high = df['High'].tail(lookback)
-    low = df['Low'].tail(lookback)
-    close = df['Close'].tail(lookback)
-    volume = df['Volume'].tail(lookback) if 'Volume' in df.columns else None
-    current_price = float(close.iloc[-1])
+    high = high[-lookback:]
+    low = low[-lookback:]
+    close = close[-lookback:]
+    volume = volume[-lookback:] if volume is not None else None
+    vol_mean = volume.mean() if volume is not None else 0.0
+    current_price = float(close[-1])
     
     # METHOD 1: PIVOT POINTS
-    pivot_highs = []
-    pivot_lows = []
-    
-    for i in range(3, len(high) - 3):
-        # Pivot high
-        if (high.iloc[i] >= high.iloc[i-1] and high.iloc[i] >= high.iloc[i-2] and
-            high.iloc[i] >= high.iloc[i-3] and high.iloc[i] >= high.iloc[i+1] and
-            high.iloc[i] >= high.iloc[i+2] and high.iloc[i] >= high.iloc[i+3]):
-            
-            vol_weight = 1.0
-            if volume is not None and volume.iloc[i] > volume.mean():
-                vol_weight = 1.5
-            
-            pivot_highs.append({
-                'price': float(high.iloc[i]),
-                'index': i,
-                'weight': vol_weight
-            })
-        
-        # Pivot low
-        if (low.iloc[i] <= low.iloc[i-1] and low.iloc[i] <= low.iloc[i-2] and
-            low.iloc[i] <= low.iloc[i-3] and low.iloc[i] <= low.iloc[i+1] and
-            low.iloc[i] <= low.iloc[i+2] and low.iloc[i] <= low.iloc[i+3]):
-            
-            vol_weight = 1.0
-            if volume is not None and volume.iloc[i] > volume.mean():
-                vol_weight = 1.5
-            
-            pivot_lows.append({
-                'price': float(low.iloc[i]),
-                'index': i,
-                'weight': vol_weight
-            })
+    pivot_high_idx = find_pivot_indices(high, order=3, highs=True)
+    pivot_low_idx = find_pivot_indices(low, order=3, highs=False)
+    
+    # Pivots on above-average volume count for more
+    if volume is not None:
+        pivot_weights = np.where(volume > vol_mean, 1.5, 1.0)
+    else:
+        pivot_weights = np.ones(len(high))
     
     # METHOD 2: CLUSTER NEARBY LEVELS
-    def cluster_levels(pivots, threshold_pct=1.5):
+    def cluster_levels(prices, weights):
         """Cluster nearby pivot points and calculate strength."""
-        if not pivots:
+        if len(prices) == 0:
             return []
         
-        sorted_pivots = sorted(pivots, key=lambda x: x['price'])
-        clusters = []
-        current_cluster = [sorted_pivots[0]]
+        order = np.argsort(prices, kind='stable')
+        cluster_prices, cluster_touches, cluster_weights = _cluster_levels(prices[order], weights[order])
         
-        for pivot in sorted_pivots[1:]:
-            cluster_center = sum(p['price'] for p in current_cluster) / len(current_cluster)
-            if (pivot['price'] - cluster_center) / cluster_center * 100 < threshold_pct:
-                current_cluster.append(pivot)
-            else:
-                avg_price = sum(p['price'] * p['weight'] for p in current_cluster) / sum(p['weight'] for p in current_cluster)
-                total_weight = sum(p['weight'] for p in current_cluster)
-                touch_count = len(current_cluster)
-                
-                clusters.append({
-                    'price': avg_price,
-                    'touches': touch_count,
-                    'weight': total_weight,
-                    'strength': 'STRONG' if touch_count >= 3 else 'MODERATE' if touch_count >= 2 else 'WEAK'
-                })
-                
-                current_cluster = [pivot]
-        
-        # Last cluster
-        if current_cluster:
-            avg_price = sum(p['price'] * p['weight'] for p in current_cluster) / sum(p['weight'] for p in current_cluster)
-            total_weight = sum(p['weight'] for p in current_cluster)
-            touch_count = len(current_cluster)
-            
-            clusters.append({
-                'price': avg_price,
-                'touches': touch_count,
-                'weight': total_weight,
+        return [
+            {
+                'price': float(price),
+                'touches': int(touch_count),
+                'weight': float(total_weight),
                 'strength': 'STRONG' if touch_count >= 3 else 'MODERATE' if touch_count >= 2 else 'WEAK'
-            })
-        
-        return clusters
+            }
+            for price, touch_count, total_weight in zip(cluster_prices, cluster_touches, cluster_weights)
+        ]
     
-    support_clusters = cluster_levels(pivot_lows)
-    resistance_clusters = cluster_levels(pivot_highs)
+    support_clusters = cluster_levels(low[pivot_low_idx], pivot_weights[pivot_low_idx])
+    resistance_clusters = cluster_levels(high[pivot_high_idx], pivot_weights[pivot_high_idx])
     
     # Find nearest support
     supports_below = [s for s in support_clusters if s['price'] < current_price]
@@ -1298,19 +1791,20 @@ def find_support_resistance(df, lookback=60):
 # MOMENTUM SCORING (0-100)
 # ============================================================================
 
-def calculate_momentum_score(df):
+def calculate_momentum_score(df, snapshot=None):
     """
     Calculate comprehensive momentum score (0-100)
     Higher = More bullish, Lower = More bearish
+    Pass snapshot from get_indicator_snapshot to reuse its indicator values.
     """
     close = df['Close']
+    if snapshot is None:
+        snapshot = get_indicator_snapshot(close)
     score = 50  # Start neutral
     components = {}
     
     # RSI Component (0-20 points)
-    rsi = calculate_rsi(close).iloc[-1]
-    if pd.isna(rsi):
-        rsi = 50
+    rsi = snapshot['rsi']
     
     if rsi > 70:
         rsi_score = -10  # Overbought
@@ -1329,14 +1823,8 @@ def calculate_momentum_score(df):
     components['RSI'] = rsi_score
     
     # MACD Component (0-20 points)
-    macd, signal, histogram = calculate_macd(close)
-    hist_current = histogram.iloc[-1] if len(histogram) > 0 else 0
-    hist_prev = histogram.iloc[-2] if len(histogram) > 1 else 0
-    
-    if pd.isna(hist_current):
-        hist_current = 0
-    if pd.isna(hist_prev):
-        hist_prev = 0
+    hist_current = snapshot['macd_hist']
+    hist_prev = snapshot['macd_hist_prev']
     
     if hist_current > 0:
         if hist_current > hist_prev:
@@ -1353,10 +1841,11 @@ def calculate_momentum_score(df):
     components['MACD'] = macd_score
     
     # Moving Average Component (0-20 points)
-    current_price = close.iloc[-1]
-    sma_20 = close.rolling(20).mean().iloc[-1] if len(close) >= 20 else close.mean()
-    sma_50 = close.rolling(50).mean().iloc[-1] if len(close) >= 50 else sma_20
-    ema_9 = close.ewm(span=9).mean().iloc[-1]
+    prices = close.to_numpy(dtype=float)
+    current_price = prices[-1]
+    sma_20 = snapshot['sma_20']
+    sma_50 = snapshot['sma_50']
+    ema_9 = snapshot['ema_9']
     
     ma_score = 0
     if current_price > ema_9:
@@ -1381,7 +1870,7 @@ def calculate_momentum_score(df):
     components['MA'] = ma_score
     
     # Price Momentum (0-15 points)
-    returns_5d = ((close.iloc[-1] / close.iloc[-6]) - 1) * 100 if len(close) > 6 else 0
+    returns_5d = ((prices[-1] / prices[-6]) - 1) * 100 if len(prices) > 6 else 0
     momentum_score = min(15, max(-15, returns_5d * 3))
     score += momentum_score
     components['Momentum'] = momentum_score
@@ -1421,45 +1910,189 @@ def calculate_momentum_score(df):
 # MULTI-TIMEFRAME ANALYSIS
 # ============================================================================
 
-def multi_timeframe_analysis(ticker, position_type):
-    """Analyze multiple timeframes with rate limiting."""
-    symbol = ticker if '.NS' in str(ticker) else f"{ticker}.NS"
+def mtf_symbol(ticker):
+    """Yahoo symbol used for multi-timeframe fetches"""
+    return yahoo_symbol(ticker)
+
+# yf.download gathers results in module-global state (yfinance.shared) -
+# two downloads running at once can mix or drop each other's frames
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
+def _download_mtf_batch(symbols, period, interval):
+    """
+    One yf.download for every symbol in the portfolio.
+    Returns: {symbol: bars} - symbols Yahoo returned nothing for are left out
+    """
+    rate_limited_api_call(f"batch:{interval}", min_interval=0.3)
+    # auto_adjust matches Ticker.history() bars regardless of the yfinance default
+    with _YF_DOWNLOAD_LOCK:
+        data = yf.download(list(symbols), period=period, interval=interval,
+                           group_by='ticker', auto_adjust=True, threads=True, progress=False)
+    
+    bars = {}
+    if data is None or data.empty:
+        return bars
+    
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            symbol_df = data[symbol]
+        else:
+            symbol_df = data  # single-ticker downloads come back with flat columns
+        symbol_df = symbol_df.dropna(how='all')
+        if not symbol_df.empty:
+            bars[symbol] = symbol_df
+    return bars
+
+# Position prices (SL/target/P&L) refresh in session as often as the 15 s analysis cache
+PRICE_REFRESH_SECONDS = 15
+
+# Closing prices keep settling on Yahoo for a while after the 15:30 close
+MARKET_SETTLED_AT = datetime.strptime("16:00", "%H:%M").time()
+
+def market_cache_bucket(open_ttl):
+    """
+    Cache-key bucket for price history fetches. Rolls every open_ttl seconds while
+    the market is open and until MARKET_SETTLED_AT after the close. Otherwise it is
+    the IST date plus the session status, so pre-market bars (still the previous
+    session's) never share a key with that day's post-close bars.
+    """
+    is_open, status, _, _ = is_market_hours()
+    ist_now = get_ist_now()
+    settling = status == "CLOSED" and ist_now.time() < MARKET_SETTLED_AT
+    if is_open or settling:
+        return int(time.time() // open_ttl)
+    return f"{ist_now:%Y-%m-%d}:{status}"
+
+# Fetchers take cache_bucket so st.cache_data keys follow the market session;
+# the decorator ttl only bounds how long old buckets are kept around.
+@st.cache_data(ttl=86400, max_entries=1000)
+def _mtf_batch_daily(symbols, cache_bucket=None):
+    """Daily bars for all symbols in one download"""
+    return _download_mtf_batch(symbols, "3mo", "1d")
+
+@st.cache_data(ttl=86400, max_entries=1000)
+def _mtf_batch_weekly(symbols, cache_bucket=None):
+    """Weekly bars for all symbols in one download"""
+    return _download_mtf_batch(symbols, "1y", "1wk")
+
+@st.cache_data(ttl=300)
+def _mtf_batch_hourly(symbols, cache_bucket=None):
+    """Hourly bars for all symbols in one download"""
+    return _download_mtf_batch(symbols, "5d", "1h")
+
+# Bullish checks passed (0-4) -> (signal, strength). 2 of 4 (50%) counts as bullish
+MTF_SIGNAL_LEVELS = (
+    ("BEARISH", "Strong"),
+    ("BEARISH", "Strong"),
+    ("BULLISH", "Moderate"),
+    ("BULLISH", "Strong"),
+    ("BULLISH", "Strong"),
+)
+
+@st.cache_data(ttl=86400, max_entries=1000)  # Refreshed via cache_bucket while the market is open
+def _mtf_bars_daily(symbol, cache_bucket=None):
+    """Fetch daily bars for multi-timeframe analysis"""
+    rate_limited_api_call(f"{symbol}:1d", min_interval=0.3)
+    return yf.Ticker(symbol).history(period="3mo", interval="1d")
+
+@st.cache_data(ttl=86400, max_entries=1000)  # Refreshed via cache_bucket while the market is open
+def _mtf_bars_weekly(symbol, cache_bucket=None):
+    """Fetch weekly bars for multi-timeframe analysis"""
+    rate_limited_api_call(f"{symbol}:1wk", min_interval=0.3)
+    return yf.Ticker(symbol).history(period="1y", interval="1wk")
+
+@st.cache_data(ttl=300)  # Hourly bars - refresh every 5 minutes
+def _mtf_bars_hourly(symbol, cache_bucket=None):
+    """Fetch hourly bars for multi-timeframe analysis"""
+    rate_limited_api_call(f"{symbol}:1h", min_interval=0.3)
+    return yf.Ticker(symbol).history(period="5d", interval="1h")
+
+def mtf_fetchers():
+    """
+    Timeframe -> (single fetcher, batch fetcher, minimum bars, cache bucket).
+    Daily/weekly bars refresh hourly in session, hourly bars every 5 min (open only)
+    """
+    fetchers = {
+        'Daily': (_mtf_bars_daily, _mtf_batch_daily, 20, market_cache_bucket(3600)),
+        'Weekly': (_mtf_bars_weekly, _mtf_batch_weekly, 10, market_cache_bucket(3600)),
+    }
+    if is_market_hours()[0]:
+        fetchers['Hourly'] = (_mtf_bars_hourly, _mtf_batch_hourly, 10, market_cache_bucket(300))
+    return fetchers
+
+def prefetch_mtf_batches(mtf_universe):
+    """
+    Download the batched MTF bars on the calling (script) thread, one timeframe
+    after another, before positions fan out to worker threads. Daily bars are
+    skipped - they come from each position's own daily history.
+    Returns: {timeframe: {symbol: bars}} - empty for a single-ticker universe
+    """
+    batches = {}
+    if not mtf_universe or len(mtf_universe) < 2:
+        return batches
+    
+    for tf_name, (_, batch_fetcher, _, cache_bucket) in mtf_fetchers().items():
+        if tf_name == 'Daily':
+            continue
+        try:
+            batches[tf_name] = batch_fetcher(mtf_universe, cache_bucket)
+        except Exception as e:
+            logger.error(f"MTF {tf_name} batch download failed: {str(e)}")
+    return batches
+
+def multi_timeframe_analysis(ticker, position_type, mtf_universe=None, daily_df=None,
+                             mtf_batches=None):
+    """
+    Analyze multiple timeframes using cached bar fetches.
+    mtf_universe: tuple of all portfolio symbols - bars then come from one
+    cached multi-ticker download per timeframe instead of one call per ticker.
+    daily_df: daily history already in hand - its last 3 months stand in for
+    the Daily fetch.
+    mtf_batches: prefetch_mtf_batches output - timeframes found there are not fetched again.
+    """
+    symbol = mtf_symbol(ticker)
+    if not mtf_universe or len(mtf_universe) < 2 or symbol not in mtf_universe:
+        mtf_universe = None  # single ticker - the per-symbol fetch is just as good
     
     try:
-        rate_limited_api_call(symbol)
-        stock = yf.Ticker(symbol)
-        
         timeframes = {}
-        
-        # Daily
-        try:
-            daily_df = stock.history(period="3mo", interval="1d")
-            if len(daily_df) >= 20:
-                timeframes['Daily'] = daily_df
-        except:
-            pass
-        
-        time.sleep(0.3)
-        
-        # Weekly
-        try:
-            weekly_df = stock.history(period="1y", interval="1wk")
-            if len(weekly_df) >= 10:
-                timeframes['Weekly'] = weekly_df
-        except:
-            pass
-        
-        # Hourly (only during market hours)
-        is_open, _, _, _ = is_market_hours()
-        if is_open:
-            time.sleep(0.3)
+        fetchers = mtf_fetchers()
+        tf_order = list(fetchers)
+        
+        # Daily bars from the caller's history - same 3mo window as the Daily fetch
+        if daily_df is not None and 'Date' in daily_df.columns:
+            dates = daily_df['Date']
+            recent = daily_df[dates >= dates.iloc[-1] - pd.DateOffset(months=3)]
+            if len(recent) >= fetchers['Daily'][2]:
+                timeframes['Daily'] = recent
+                del fetchers['Daily']
+        
+        # Bars the caller already downloaded for the whole portfolio
+        for tf_name, batch in (mtf_batches or {}).items():
+            bars = batch.get(symbol)
+            if tf_name in fetchers and bars is not None and len(bars) >= fetchers[tf_name][2]:
+                timeframes[tf_name] = bars
+                del fetchers[tf_name]
+        
+        # Anything left is fetched here - positions already run on a worker pool,
+        # so no nested pool (keeps concurrent Yahoo calls at ANALYSIS_WORKERS)
+        for tf_name, (single_fetcher, batch_fetcher, min_bars, cache_bucket) in fetchers.items():
             try:
-                hourly_df = stock.history(period="5d", interval="1h")
-                if len(hourly_df) >= 10:
-                    timeframes['Hourly'] = hourly_df
+                tf_df = None
+                if mtf_universe is not None:
+                    tf_df = batch_fetcher(mtf_universe, cache_bucket).get(symbol)
+                if tf_df is None:
+                    tf_df = single_fetcher(symbol, cache_bucket)
+                if len(tf_df) >= min_bars:
+                    timeframes[tf_name] = tf_df
             except:
                 pass
         
+        # Daily/Weekly/Hourly order
+        timeframes = {tf_name: timeframes[tf_name] for tf_name in tf_order if tf_name in timeframes}
+        
         if not timeframes:
             return {
                 'signals': {},
@@ -1474,73 +2107,46 @@ def multi_timeframe_analysis(ticker, position_type):
         
         signals = {}
         details = {}
+        signal_counts = {"BULLISH": 0, "BEARISH": 0}  # tallied as each timeframe is scored
         
         for tf_name, tf_df in timeframes.items():
             if len(tf_df) >= 14:
                 close = tf_df['Close']
-                current = float(close.iloc[-1])
-                
-                rsi = calculate_rsi(close).iloc[-1]
-                if pd.isna(rsi):
-                    rsi = 50
-                
-                sma_20 = close.rolling(20).mean().iloc[-1] if len(close) >= 20 else close.mean()
-                ema_9 = close.ewm(span=9).mean().iloc[-1]
-                ema_21 = close.ewm(span=21).mean().iloc[-1] if len(close) >= 21 else close.mean()
-                
-                macd, signal_line, histogram = calculate_macd(close)
-                macd_hist = histogram.iloc[-1] if len(histogram) > 0 else 0
-                if pd.isna(macd_hist):
-                    macd_hist = 0
+                prices = close.to_numpy(dtype=float)
+                current = float(prices[-1])
                 
-                bullish_points = 0
-                total_points = 8
+                snapshot = get_indicator_snapshot(close)
+                rsi = snapshot['rsi']
+                sma_20 = snapshot['sma_20']
+                ema_9 = snapshot['ema_9']
+                ema_21 = snapshot['ema_21']
+                macd_hist = snapshot['macd_hist']
                 
-                if rsi > 50:
-                    bullish_points += 2
-                if current > sma_20:
-                    bullish_points += 2
-                if ema_9 > ema_21:
-                    bullish_points += 2
-                if macd_hist > 0:
-                    bullish_points += 2
-                
-                bullish_pct = (bullish_points / total_points) * 100
-                
-                if bullish_pct >= 75:
-                    signal = "BULLISH"
-                    strength = "Strong"
-                elif bullish_pct >= 50:
-                    signal = "BULLISH"
-                    strength = "Moderate"
-                elif bullish_pct <= 25:
-                    signal = "BEARISH"
-                    strength = "Strong"
-                elif bullish_pct < 50:
-                    signal = "BEARISH"
-                    strength = "Moderate"
-                else:
-                    signal = "NEUTRAL"
-                    strength = "Weak"
+                # Four equally weighted bullish checks
+                above_sma20 = current > sma_20
+                ema_bullish = ema_9 > ema_21
+                macd_bullish = macd_hist > 0
+                bullish_count = int(rsi > 50) + int(above_sma20) + int(ema_bullish) + int(macd_bullish)
+                bullish_pct = (bullish_count / 4) * 100
+                signal, strength = MTF_SIGNAL_LEVELS[bullish_count]
                 
                 signals[tf_name] = signal
+                signal_counts[signal] += 1
                 details[tf_name] = {
                     'signal': signal,
                     'strength': strength,
                     'rsi': rsi,
-                    'above_sma20': current > sma_20,
-                    'ema_bullish': ema_9 > ema_21,
-                    'macd_bullish': macd_hist > 0,
+                    'above_sma20': above_sma20,
+                    'ema_bullish': ema_bullish,
+                    'macd_bullish': macd_bullish,
                     'bullish_score': bullish_pct
                 }
         
         # Calculate alignment
         if position_type == "LONG":
-            aligned = sum(1 for s in signals.values() if s == "BULLISH")
-            against = sum(1 for s in signals.values() if s == "BEARISH")
+            aligned, against = signal_counts["BULLISH"], signal_counts["BEARISH"]
         else:
-            aligned = sum(1 for s in signals.values() if s == "BEARISH")
-            against = sum(1 for s in signals.values() if s == "BULLISH")
+            aligned, against = signal_counts["BEARISH"], signal_counts["BULLISH"]
         
         total = len(signals)
         alignment_score = int((aligned / total) * 100) if total > 0 else 50
@@ -1639,7 +2245,19 @@ def analyze_correlation_risk(correlation_matrix, threshold=0.7):
 # STOP LOSS RISK PREDICTION (0-100)
 # ============================================================================
 
-def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl_alert_threshold=50):
+# Distance-to-SL tiers (% away): breached, <1, <2, <3, <5, further
+SL_DISTANCE_EDGES = np.array([0, 1, 2, 3, 5])
+SL_DISTANCE_TIERS = (
+    (100, "⚠️ SL already breached!"),
+    (40, "🔴 Very close to SL ({:.1f}% away)"),
+    (30, "🟠 Close to SL ({:.1f}% away)"),
+    (15, "🟡 Approaching SL ({:.1f}% away)"),
+    (5, None),
+    (0, None),
+)
+
+def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl_alert_threshold=50,
+                    snapshot=None, volume=None):
     """
     Predict likelihood of hitting stop loss
     Returns: risk_score (0-100), reasons, recommendation, priority
@@ -1647,6 +2265,8 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
     risk_score = 0
     reasons = []
     close = df['Close']
+    if snapshot is None:
+        snapshot = get_indicator_snapshot(close)
     
     # Distance to Stop Loss (0-40 points)
     if position_type == "LONG":
@@ -1654,25 +2274,15 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
     else:
         distance_pct = ((stop_loss - current_price) / current_price) * 100
     
-    if distance_pct < 0:  # Already hit SL
-        risk_score = 100
-        reasons.append("⚠️ SL already breached!")
-    elif distance_pct < 1:
-        risk_score += 40
-        reasons.append(f"🔴 Very close to SL ({distance_pct:.1f}% away)")
-    elif distance_pct < 2:
-        risk_score += 30
-        reasons.append(f"🟠 Close to SL ({distance_pct:.1f}% away)")
-    elif distance_pct < 3:
-        risk_score += 15
-        reasons.append(f"🟡 Approaching SL ({distance_pct:.1f}% away)")
-    elif distance_pct < 5:
-        risk_score += 5
+    tier_score, tier_reason = SL_DISTANCE_TIERS[np.searchsorted(SL_DISTANCE_EDGES, distance_pct, side='right')]
+    risk_score += tier_score
+    if tier_reason:
+        reasons.append(tier_reason.format(distance_pct))
     
     # Trend Against Position (0-25 points)
-    sma_20 = close.rolling(20).mean().iloc[-1] if len(close) >= 20 else close.mean()
-    sma_50 = close.rolling(50).mean().iloc[-1] if len(close) >= 50 else sma_20
-    ema_9 = close.ewm(span=9).mean().iloc[-1]
+    sma_20 = snapshot['sma_20']
+    sma_50 = snapshot['sma_50']
+    ema_9 = snapshot['ema_9']
     
     if position_type == "LONG":
         if current_price < ema_9:
@@ -1702,14 +2312,8 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
             reasons.append("📈 Golden cross forming")
     
     # MACD Against Position (0-15 points)
-    macd, signal, histogram = calculate_macd(close)
-    hist_current = histogram.iloc[-1] if len(histogram) > 0 else 0
-    hist_prev = histogram.iloc[-2] if len(histogram) > 1 else 0
-    
-    if pd.isna(hist_current):
-        hist_current = 0
-    if pd.isna(hist_prev):
-        hist_prev = 0
+    hist_current = snapshot['macd_hist']
+    hist_prev = snapshot['macd_hist_prev']
     
     if position_type == "LONG":
         if hist_current < 0:
@@ -1727,9 +2331,7 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
             reasons.append("📊 MACD rising")
     
     # RSI Extreme (0-10 points)
-    rsi = calculate_rsi(close).iloc[-1]
-    if pd.isna(rsi):
-        rsi = 50
+    rsi = snapshot['rsi']
     
     if position_type == "LONG" and rsi < 35:
         risk_score += 10
@@ -1740,21 +2342,25 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
     
     # Consecutive Candles Against Position (0-10 points)
     if len(close) >= 4:
-        last_3 = close.tail(4).diff().dropna()
-        if position_type == "LONG" and all(last_3 < 0):
+        last_3 = np.diff(close.to_numpy(dtype=float)[-4:])
+        last_3 = last_3[~np.isnan(last_3)]
+        if position_type == "LONG" and (last_3 < 0).all():
             risk_score += 10
             reasons.append("🕯️ 3 consecutive red candles")
-        elif position_type == "SHORT" and all(last_3 > 0):
+        elif position_type == "SHORT" and (last_3 > 0).all():
             risk_score += 10
             reasons.append("🕯️ 3 consecutive green candles")
     
     # Volume Confirmation (0-10 points)
-    volume_signal, volume_ratio, _, _ = analyze_volume(df)
+    if volume is None:
+        volume = analyze_volume(df)
+    volume_signal, volume_ratio, _, _ = volume
+    volume_pressure = VOLUME_SIGNAL_PRESSURE.get(volume_signal, 0)
     
-    if position_type == "LONG" and volume_signal in ["STRONG_SELLING", "SELLING"]:
+    if position_type == "LONG" and volume_pressure < 0:
         risk_score += 10
         reasons.append(f"📊 Selling volume ({volume_ratio:.1f}x)")
-    elif position_type == "SHORT" and volume_signal in ["STRONG_BUYING", "BUYING"]:
+    elif position_type == "SHORT" and volume_pressure > 0:
         risk_score += 10
         reasons.append(f"📊 Buying volume ({volume_ratio:.1f}x)")
     
@@ -1784,7 +2390,8 @@ def predict_sl_risk(df, current_price, stop_loss, position_type, entry_price, sl
 # UPSIDE POTENTIAL PREDICTION
 # ============================================================================
 
-def predict_upside_potential(df, current_price, target1, target2, position_type):
+def predict_upside_potential(df, current_price, target1, target2, position_type, snapshot=None,
+                             sr_levels=None, volume=None, momentum=None, atr=None):
     """
     Predict if stock can continue after hitting target
     Returns: upside_score (0-100), new_target, reasons, recommendation, action
@@ -1792,9 +2399,13 @@ def predict_upside_potential(df, current_price, target1, target2, position_type)
     score = 50  # Start neutral
     reasons = []
     close = df['Close']
+    if snapshot is None:
+        snapshot = get_indicator_snapshot(close)
     
     # Momentum still strong?
-    momentum_score, trend, _ = calculate_momentum_score(df)
+    if momentum is None:
+        momentum = calculate_momentum_score(df, snapshot=snapshot)
+    momentum_score, trend, _ = momentum
     
     if position_type == "LONG":
         if momentum_score >= 70:
@@ -1818,9 +2429,7 @@ def predict_upside_potential(df, current_price, target1, target2, position_type)
             reasons.append(f"📈 Bullish reversal ({momentum_score:.0f})")
     
     # RSI not extreme?
-    rsi = calculate_rsi(close).iloc[-1]
-    if pd.isna(rsi):
-        rsi = 50
+    rsi = snapshot['rsi']
     
     if position_type == "LONG":
         if rsi < 60:
@@ -1841,12 +2450,15 @@ def predict_upside_potential(df, current_price, target1, target2, position_type)
             reasons.append(f"⚠️ RSI oversold ({rsi:.0f})")
     
     # Volume confirming?
-    volume_signal, volume_ratio, _, volume_trend = analyze_volume(df)
+    if volume is None:
+        volume = analyze_volume(df)
+    volume_signal, volume_ratio, _, volume_trend = volume
+    volume_pressure = VOLUME_SIGNAL_PRESSURE.get(volume_signal, 0)
     
-    if position_type == "LONG" and volume_signal in ["STRONG_BUYING", "BUYING"]:
+    if position_type == "LONG" and volume_pressure > 0:
         score += 15
         reasons.append(f"📊 Buying volume ({volume_ratio:.1f}x)")
-    elif position_type == "SHORT" and volume_signal in ["STRONG_SELLING", "SELLING"]:
+    elif position_type == "SHORT" and volume_pressure < 0:
         score += 15
         reasons.append(f"📊 Selling volume ({volume_ratio:.1f}x)")
     elif volume_ratio < 0.7:
@@ -1854,36 +2466,35 @@ def predict_upside_potential(df, current_price, target1, target2, position_type)
         reasons.append("📊 Low volume")
     
     # Bollinger Band position
-    upper_bb, middle_bb, lower_bb = calculate_bollinger_bands(close)
-    if len(upper_bb) > 0 and len(lower_bb) > 0:
-        bb_upper = upper_bb.iloc[-1]
-        bb_lower = lower_bb.iloc[-1]
-        bb_range = bb_upper - bb_lower
-        
-        if bb_range > 0:
-            if position_type == "LONG":
-                bb_position = (current_price - bb_lower) / bb_range
-                if bb_position < 0.7:
-                    score += 10
-                    reasons.append("📈 Room to upper BB")
-                elif bb_position > 0.95:
-                    score -= 15
-                    reasons.append("⚠️ At upper BB")
-            else:
-                bb_position = (current_price - bb_lower) / bb_range
-                if bb_position > 0.3:
-                    score += 10
-                    reasons.append("📉 Room to lower BB")
-                elif bb_position < 0.05:
-                    score -= 15
-                    reasons.append("⚠️ At lower BB")
+    bb_upper, _, bb_lower = bollinger_last(close.to_numpy(dtype=float))
+    bb_range = bb_upper - bb_lower
+    
+    if bb_range > 0:
+        if position_type == "LONG":
+            bb_position = (current_price - bb_lower) / bb_range
+            if bb_position < 0.7:
+                score += 10
+                reasons.append("📈 Room to upper BB")
+            elif bb_position > 0.95:
+                score -= 15
+                reasons.append("⚠️ At upper BB")
+        else:
+            bb_position = (current_price - bb_lower) / bb_range
+            if bb_position > 0.3:
+                score += 10
+                reasons.append("📉 Room to lower BB")
+            elif bb_position < 0.05:
+                score -= 15
+                reasons.append("⚠️ At lower BB")
     
     # Calculate new target based on ATR and S/R
-    atr = calculate_atr(df['High'], df['Low'], close).iloc[-1]
-    if pd.isna(atr):
+    if atr is None:
+        atr = calculate_atr(df['High'], df['Low'], close).to_numpy()[-1]
+    if np.isnan(atr):
         atr = current_price * 0.02
     
-    sr_levels = find_support_resistance(df)
+    if sr_levels is None:
+        sr_levels = find_support_resistance(df)
     
     if position_type == "LONG":
         atr_target = current_price + (atr * 3)
@@ -1920,25 +2531,35 @@ def predict_upside_potential(df, current_price, target1, target2, position_type)
 # DYNAMIC TARGET & TRAIL STOP CALCULATION
 # ============================================================================
 
+# Trail ladder, best tier first: (P&L >= trail_trigger x multiple) -> ATR multiple,
+# share of open profit locked, entry floor (LONG, SHORT), reason, action
+TRAIL_LADDER = (
+    (5, 1.0, 0.70, None, "Locking 70%+ profit (P&L: {:.1f}%)", "LOCK_MAJOR_PROFIT"),
+    (4, 1.2, 0.60, None, "Locking 60% profit (P&L: {:.1f}%)", "LOCK_PROFITS"),
+    (3, 1.5, 0.50, None, "Locking 50% profit (P&L: {:.1f}%)", "SECURE_GAINS"),
+    (2, 2.0, 0.30, (1.005, 0.995), "Securing gains (P&L: {:.1f}%)", "SECURE_GAINS"),
+    (1, 2.5, None, (1.0, 1.0), "Moving to breakeven (P&L: {:.1f}%)", "BREAKEVEN"),
+    (0.5, 3.0, None, None, "Tightening SL (P&L: {:.1f}%)", "TIGHTEN"),
+)
+
 def calculate_dynamic_levels(df, entry_price, current_price, stop_loss, position_type,
-                            pnl_percent, trail_trigger=2.0):
+                            pnl_percent, trail_trigger=2.0, atr=None, sr_levels=None):
     """
     Calculate dynamic targets and trailing stop loss.
     Uses ATR-based dynamic trailing instead of fixed percentages.
+    Pass a precomputed atr / sr_levels to skip recalculating them.
     """
-    close = df['Close']
-    high = df['High']
-    low = df['Low']
-    
     # Calculate ATR
-    atr = calculate_atr(high, low, close).iloc[-1]
-    if pd.isna(atr) or atr <= 0:
+    if atr is None:
+        atr = calculate_atr(df['High'], df['Low'], df['Close']).to_numpy()[-1]
+    if np.isnan(atr) or atr <= 0:
         atr = current_price * 0.02
     
     atr_pct = (atr / current_price) * 100
     
     # Get support/resistance
-    sr_levels = find_support_resistance(df)
+    if sr_levels is None:
+        sr_levels = find_support_resistance(df)
     
     result = {
         'atr': atr,
@@ -1950,124 +2571,44 @@ def calculate_dynamic_levels(df, entry_price, current_price, stop_loss, position
     }
     
     # DYNAMIC TRAIL STOP CALCULATION
-    if position_type == "LONG":
-        # Calculate dynamic targets
-        result['target1'] = current_price + (atr * 1.5)
-        result['target2'] = current_price + (atr * 3)
-        result['target3'] = min(current_price + (atr * 5), sr_levels['nearest_resistance'])
-        
-        # Dynamic trail based on profit level AND volatility (ATR)
-        if pnl_percent >= trail_trigger * 5:  # e.g., 10% profit
-            atr_trail = current_price - (atr * 1.0)
-            pct_trail = entry_price + (current_price - entry_price) * 0.70
-            result['trail_stop'] = max(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 70%+ profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "LOCK_MAJOR_PROFIT"
-        
-        elif pnl_percent >= trail_trigger * 4:  # e.g., 8%
-            atr_trail = current_price - (atr * 1.2)
-            pct_trail = entry_price + (current_price - entry_price) * 0.60
-            result['trail_stop'] = max(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 60% profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "LOCK_PROFITS"
-        
-        elif pnl_percent >= trail_trigger * 3:  # e.g., 6%
-            atr_trail = current_price - (atr * 1.5)
-            pct_trail = entry_price + (current_price - entry_price) * 0.50
-            result['trail_stop'] = max(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 50% profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "SECURE_GAINS"
-        
-        elif pnl_percent >= trail_trigger * 2:  # e.g., 4%
-            atr_trail = current_price - (atr * 2.0)
-            pct_trail = entry_price + (current_price - entry_price) * 0.30
-            result['trail_stop'] = max(atr_trail, pct_trail, entry_price * 1.005)
-            result['trail_reason'] = f"Securing gains (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "SECURE_GAINS"
-        
-        elif pnl_percent >= trail_trigger:  # e.g., 2%
-            atr_trail = current_price - (atr * 2.5)
-            result['trail_stop'] = max(atr_trail, entry_price)
-            result['trail_reason'] = f"Moving to breakeven (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "BREAKEVEN"
-        
-        elif pnl_percent >= trail_trigger * 0.5:  # e.g., 1%
-            atr_trail = current_price - (atr * 3.0)
-            result['trail_stop'] = max(atr_trail, stop_loss)
-            if result['trail_stop'] > stop_loss:
-                result['trail_reason'] = f"Tightening SL (P&L: {pnl_percent:.1f}%)"
-                result['trail_action'] = "TIGHTEN"
-            else:
-                result['trail_reason'] = "Keep original SL"
-                result['trail_action'] = "HOLD"
-        else:
-            result['trail_stop'] = stop_loss
-            result['trail_reason'] = "Keep original SL - profit not enough to trail"
-            result['trail_action'] = "HOLD"
-        
-        # Ensure trail stop is not below original SL
-        result['trail_stop'] = max(result['trail_stop'], stop_loss)
-        result['should_trail'] = result['trail_stop'] > stop_loss
-        result['trail_improvement'] = result['trail_stop'] - stop_loss if result['should_trail'] else 0
-        result['trail_improvement_pct'] = (result['trail_improvement'] / entry_price * 100) if result['should_trail'] else 0
-    
-    else:  # SHORT position
-        result['target1'] = current_price - (atr * 1.5)
-        result['target2'] = current_price - (atr * 3)
-        result['target3'] = max(current_price - (atr * 5), sr_levels['nearest_support'])
-        
-        if pnl_percent >= trail_trigger * 5:
-            atr_trail = current_price + (atr * 1.0)
-            pct_trail = entry_price - (entry_price - current_price) * 0.70
-            result['trail_stop'] = min(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 70%+ profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "LOCK_MAJOR_PROFIT"
-        
-        elif pnl_percent >= trail_trigger * 4:
-            atr_trail = current_price + (atr * 1.2)
-            pct_trail = entry_price - (entry_price - current_price) * 0.60
-            result['trail_stop'] = min(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 60% profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "LOCK_PROFITS"
-        
-        elif pnl_percent >= trail_trigger * 3:
-            atr_trail = current_price + (atr * 1.5)
-            pct_trail = entry_price - (entry_price - current_price) * 0.50
-            result['trail_stop'] = min(atr_trail, pct_trail)
-            result['trail_reason'] = f"Locking 50% profit (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "SECURE_GAINS"
-        
-        elif pnl_percent >= trail_trigger * 2:
-            atr_trail = current_price + (atr * 2.0)
-            pct_trail = entry_price - (entry_price - current_price) * 0.30
-            result['trail_stop'] = min(atr_trail, pct_trail, entry_price * 0.995)
-            result['trail_reason'] = f"Securing gains (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "SECURE_GAINS"
-        
-        elif pnl_percent >= trail_trigger:
-            atr_trail = current_price + (atr * 2.5)
-            result['trail_stop'] = min(atr_trail, entry_price)
-            result['trail_reason'] = f"Moving to breakeven (P&L: {pnl_percent:.1f}%)"
-            result['trail_action'] = "BREAKEVEN"
-        
-        elif pnl_percent >= trail_trigger * 0.5:
-            atr_trail = current_price + (atr * 3.0)
-            result['trail_stop'] = min(atr_trail, stop_loss)
-            if result['trail_stop'] < stop_loss:
-                result['trail_reason'] = f"Tightening SL (P&L: {pnl_percent:.1f}%)"
-                result['trail_action'] = "TIGHTEN"
-            else:
-                result['trail_reason'] = "Keep original SL"
-                result['trail_action'] = "HOLD"
-        else:
-            result['trail_stop'] = stop_loss
-            result['trail_reason'] = "Keep original SL - profit not enough to trail"
-            result['trail_action'] = "HOLD"
-        
-        result['trail_stop'] = min(result['trail_stop'], stop_loss)
-        result['should_trail'] = result['trail_stop'] < stop_loss
-        result['trail_improvement'] = stop_loss - result['trail_stop'] if result['should_trail'] else 0
-        result['trail_improvement_pct'] = (result['trail_improvement'] / entry_price * 100) if result['should_trail'] else 0
+    # side folds LONG/SHORT together: targets and trails sit above price for SHORT, below for LONG
+    side = 1 if position_type == "LONG" else -1
+    tighter = max if side == 1 else min
+    
+    # Calculate dynamic targets
+    result['target1'] = current_price + side * (atr * 1.5)
+    result['target2'] = current_price + side * (atr * 3)
+    target3 = current_price + side * (atr * 5)
+    if side == 1:
+        result['target3'] = min(target3, sr_levels['nearest_resistance'])
+    else:
+        result['target3'] = max(target3, sr_levels['nearest_support'])
+    
+    # Dynamic trail based on profit level AND volatility (ATR) - first tier the P&L reaches
+    tier = next((t for t in TRAIL_LADDER if pnl_percent >= trail_trigger * t[0]), None)
+    if tier is None:
+        result['trail_stop'] = stop_loss
+        result['trail_reason'] = "Keep original SL - profit not enough to trail"
+        result['trail_action'] = "HOLD"
+    else:
+        _, atr_mult, lock_pct, entry_floor, reason, action = tier
+        candidates = [current_price - side * (atr * atr_mult)]
+        if lock_pct is not None:
+            candidates.append(entry_price + (current_price - entry_price) * lock_pct)
+        if entry_floor is not None:
+            candidates.append(entry_price * entry_floor[side == -1])
+        result['trail_stop'] = tighter(candidates)
+        result['trail_reason'] = reason.format(pnl_percent)
+        result['trail_action'] = action
+    
+    # Ensure trail stop never loosens the original SL
+    result['trail_stop'] = tighter(result['trail_stop'], stop_loss)
+    result['should_trail'] = result['trail_stop'] > stop_loss if side == 1 else result['trail_stop'] < stop_loss
+    if result['trail_action'] == "TIGHTEN" and not result['should_trail']:
+        result['trail_reason'] = "Keep original SL"
+        result['trail_action'] = "HOLD"
+    result['trail_improvement'] = side * (result['trail_stop'] - stop_loss) if result['should_trail'] else 0
+    result['trail_improvement_pct'] = (result['trail_improvement'] / entry_price * 100) if result['should_trail'] else 0
     
     return result
 
@@ -2230,18 +2771,20 @@ def calculate_portfolio_risk(results):
     if not results:
         return None
     
-    total_capital = sum(r['entry_price'] * r['quantity'] for r in results)
-    total_current_value = sum(r['current_price'] * r['quantity'] for r in results)
+    # Pull the per-position columns once, then work on whole arrays
+    entry = np.array([r['entry_price'] for r in results], dtype=float)
+    current = np.array([r['current_price'] for r in results], dtype=float)
+    stop_loss = np.array([r['stop_loss'] for r in results], dtype=float)
+    quantity = np.array([r['quantity'] for r in results], dtype=float)
+    direction = np.array([1.0 if r['position_type'] == 'LONG' else -1.0 for r in results])
+    
+    total_capital = float((entry * quantity).sum())
+    total_current_value = float((current * quantity).sum())
     total_pnl = sum(r['pnl_amount'] for r in results)
     
-    # Calculate total risk amount (if all SL hit)
-    total_risk_amount = 0
-    for r in results:
-        if r['position_type'] == 'LONG':
-            loss_if_sl = (r['entry_price'] - r['stop_loss']) * r['quantity']
-        else:
-            loss_if_sl = (r['stop_loss'] - r['entry_price']) * r['quantity']
-        total_risk_amount += max(loss_if_sl, 0)
+    # Calculate total risk amount (if all SL hit) - LONG loses entry-SL, SHORT loses SL-entry
+    loss_if_sl = direction * (entry - stop_loss) * quantity
+    total_risk_amount = float(np.maximum(loss_if_sl, 0).sum())
     
     portfolio_risk_pct = (total_risk_amount / total_capital * 100) if total_capital > 0 else 0
     
@@ -2367,6 +2910,139 @@ def track_partial_exit(ticker, current_price, entry_price, quantity, position_ty
         'total_booked_pnl': sum(r['pnl'] for r in recommendations if r['status'] == 'TRIGGERED')
     }
 
+# ============================================================================
+# ALERT RULES
+# ============================================================================
+# Evaluated top-down by smart_analyze_position - the first matching predicate
+# wins. Each rule: (predicate(ctx), alert template, overall_status, overall_action)
+# Templates are rendered with str.format(**ctx) only when the rule fires.
+
+ALERT_RULES = [
+    # Priority 1: SL Hit
+    (lambda c: c['sl_hit'], {
+        'priority': 'CRITICAL',
+        'type': '🚨 STOP LOSS HIT',
+        'message': 'Price ₹{current_price:.2f} breached SL ₹{stop_loss:.2f}',
+        'action': 'EXIT IMMEDIATELY',
+        'email_type': 'critical'
+    }, 'CRITICAL', 'EXIT'),
+    
+    # Priority 2: High SL Risk (Early Exit Warning)
+    (lambda c: c['sl_risk'] >= c['sl_alert_threshold'] + 20, {
+        'priority': 'CRITICAL',
+        'type': '⚠️ HIGH SL RISK',
+        'message': 'Risk Score: {sl_risk}% - {sl_reasons_text}',
+        'action': '{sl_recommendation}',
+        'email_type': 'critical'
+    }, 'CRITICAL', 'EXIT_EARLY'),
+    
+    # Priority 3: Approaching SL
+    (lambda c: c['approaching_sl'], {
+        'priority': 'HIGH',
+        'type': '⚠️ APPROACHING SL',
+        'message': 'Only {distance_to_sl:.1f}% away from Stop Loss!',
+        'action': 'Review position - consider early exit',
+        'email_type': 'sl_approach'
+    }, 'WARNING', 'WATCH'),
+    
+    # Priority 4: Moderate SL Risk
+    (lambda c: c['sl_risk'] >= c['sl_alert_threshold'], {
+        'priority': 'HIGH',
+        'type': '⚠️ MODERATE SL RISK',
+        'message': 'Risk Score: {sl_risk}% - {sl_reasons_text}',
+        'action': '{sl_recommendation}',
+        'email_type': 'important'
+    }, 'WARNING', 'WATCH'),
+    
+    # Priority 5: Target 2 Hit
+    (lambda c: c['target2_hit'], {
+        'priority': 'HIGH',
+        'type': '🎯 TARGET 2 HIT',
+        'message': 'Both targets achieved! P&L: {pnl_percent:+.2f}%',
+        'action': 'BOOK FULL PROFITS',
+        'email_type': 'target'
+    }, 'SUCCESS', 'BOOK_PROFITS'),
+    
+    # Priority 6: Target 1 Hit with strong upside - hold for more
+    (lambda c: c['target1_hit'] and c['upside_score'] >= 60, {
+        'priority': 'INFO',
+        'type': '🎯 TARGET HIT - HOLD',
+        'message': 'Upside Score: {upside_score}% - {upside_reasons_text}',
+        'action': '{upside_action}',
+        'email_type': 'target'
+    }, 'OPPORTUNITY', 'HOLD_EXTEND'),
+    
+    # Priority 6b: Target 1 Hit with limited upside - book profits
+    (lambda c: c['target1_hit'], {
+        'priority': 'HIGH',
+        'type': '🎯 TARGET HIT - EXIT',
+        'message': 'Limited upside ({upside_score}%). Book profits.',
+        'action': 'BOOK PROFITS',
+        'email_type': 'target'
+    }, 'SUCCESS', 'BOOK_PROFITS'),
+    
+    # Priority 7: Trail Stop Recommendation
+    (lambda c: c['should_trail'] and c['pnl_percent'] >= c['trail_threshold'], {
+        'priority': 'MEDIUM',
+        'type': '📈 TRAIL STOP LOSS',
+        'message': '{trail_reason} Move SL from ₹{stop_loss:.2f} to ₹{trail_stop:.2f}',
+        'action': 'New SL: ₹{trail_stop:.2f}',
+        'email_type': 'sl_change'
+    }, 'GOOD', 'TRAIL_SL'),
+    
+    # Priority 8: MTF Warning
+    (lambda c: c['enable_mtf'] and c['mtf_alignment'] < 40 and c['pnl_percent'] < 0, {
+        'priority': 'MEDIUM',
+        'type': '📊 MTF WARNING',
+        'message': 'Timeframes against position ({mtf_alignment}% aligned)',
+        'action': '{mtf_recommendation}',
+        'email_type': 'important'
+    }, 'WARNING', 'WATCH'),
+    
+    # Priority 9: Breakeven Alert
+    (lambda c: c['at_breakeven'], {
+        'priority': 'LOW',
+        'type': '🔔 BREAKEVEN REACHED',
+        'message': 'Position at breakeven. Consider moving SL to entry (₹{entry_price:.2f})',
+        'action': 'Move SL to ₹{entry_price:.2f} (breakeven)',
+        'email_type': 'important'
+    }, 'GOOD', 'MOVE_SL_BREAKEVEN'),
+]
+
+# No rule matched - no primary alert
+DEFAULT_ALERT_RULE = (None, None, 'OK', 'HOLD')
+
+# Secondary alerts (added on top of the primary rule)
+PARTIAL_EXIT_ALERT = {
+    'priority': 'LOW',
+    'type': '📊 PARTIAL EXIT',
+    'message': 'Level ₹{level:.2f} triggered - Book {exit_pct}% ({exit_qty} shares)',
+    'action': 'Exit {exit_qty} shares at ₹{current_price:.2f}',
+    'email_type': 'important'
+}
+
+VOLUME_WARNING_ALERT = {
+    'priority': 'LOW',
+    'type': '📊 VOLUME WARNING',
+    'message': '',
+    'action': 'Monitor closely',
+    'email_type': 'important'
+}
+
+MTF_DISABLED_RESULT = {
+    'signals': {},
+    'details': {},
+    'alignment_score': 50,
+    'recommendation': "MTF disabled",
+    'aligned_count': 0,
+    'against_count': 0,
+    'total_timeframes': 0,
+    'trend_strength': 'UNKNOWN'
+}
+
+# SL or final target already hit - the position is done, so no MTF download
+MTF_SKIPPED_RESULT = dict(MTF_DISABLED_RESULT, recommendation="Skipped - SL/target 2 already hit")
+
 # ============================================================================
 # COMPLETE SMART ANALYSIS FUNCTION
 # ============================================================================
@@ -2374,91 +3050,93 @@ def track_partial_exit(ticker, current_price, entry_price, quantity, position_ty
 @st.cache_data(ttl=15)  # 15 second cache
 def smart_analyze_position(ticker, position_type, entry_price, quantity, stop_loss,
                           target1, target2, trail_threshold=2.0, sl_alert_threshold=50,
-                          sl_approach_threshold=2.0, enable_mtf=True, entry_date=None):
+                          sl_approach_threshold=2.0, enable_mtf=True, entry_date=None,
+                          mtf_universe=None, _price_data=None, _mtf_batches=None):
     """
     Complete smart analysis with all features
     Accepts sidebar parameters for dynamic thresholds
+    mtf_universe: tuple of portfolio symbols for batched multi-timeframe fetches
+    _price_data: prefetched 6mo daily history (skips the per-ticker fetch; not part of the cache key)
+    _mtf_batches: prefetch_mtf_batches output for the portfolio (not part of the cache key)
     """
-    df = get_stock_data_safe(ticker, period="6mo")
+    df = _price_data
+    if df is None:
+        # Only when the batched portfolio download missed this ticker
+        df = get_stock_data_safe(ticker, period="6mo")
     if df is None or df.empty:
         return None
     
     try:
-        current_price = float(df['Close'].iloc[-1])
-        prev_close = float(df['Close'].iloc[-2]) if len(df) > 1 else current_price
+        # Extract price/volume arrays once and share them with the indicators
+        close, high, low, volume = get_ohlcv_arrays(df)
+        current_price = float(close[-1])
+        prev_close = float(close[-2]) if len(close) > 1 else current_price
         day_change = ((current_price - prev_close) / prev_close) * 100
-        day_high = float(df['High'].iloc[-1])
-        day_low = float(df['Low'].iloc[-1])
+        day_high = float(high[-1])
+        day_low = float(low[-1])
     except Exception as e:
         return None
     
+    # LONG/SHORT as a sign - moves in the position's favour come out positive for both.
+    # (+ 0.0 keeps a zero move at 0.0 rather than -0.0 for SHORT, so it never prints as "-0.00")
+    direction = 1 if position_type == "LONG" else -1
+    
     # Basic P&L
-    if position_type == "LONG":
-        pnl_percent = ((current_price - entry_price) / entry_price) * 100
-        pnl_amount = (current_price - entry_price) * quantity
-    else:
-        pnl_percent = ((entry_price - current_price) / entry_price) * 100
-        pnl_amount = (entry_price - current_price) * quantity
-    
-    # Technical Indicators
-    rsi = float(calculate_rsi(df['Close']).iloc[-1])
-    if pd.isna(rsi):
-        rsi = 50.0
-    
-    macd, signal, histogram = calculate_macd(df['Close'])
-    macd_hist = float(histogram.iloc[-1]) if len(histogram) > 0 else 0
-    if pd.isna(macd_hist):
-        macd_hist = 0
-    macd_signal = "BULLISH" if macd_hist > 0 else "BEARISH"
+    pnl_per_share = direction * (current_price - entry_price) + 0.0
+    pnl_percent = (pnl_per_share / entry_price) * 100
+    pnl_amount = pnl_per_share * quantity
     
-    # Stochastic
-    stoch_k, stoch_d = calculate_stochastic(df['High'], df['Low'], df['Close'])
-    stoch_k_val = float(stoch_k.iloc[-1]) if not pd.isna(stoch_k.iloc[-1]) else 50
-    stoch_d_val = float(stoch_d.iloc[-1]) if not pd.isna(stoch_d.iloc[-1]) else 50
+    # Check if target hit
+    target1_hit = direction * (current_price - target1) >= 0
+    target2_hit = direction * (current_price - target2) >= 0
+    sl_hit = direction * (stop_loss - current_price) >= 0
     
-    # Momentum Score
-    momentum_score, momentum_trend, momentum_components = calculate_momentum_score(df)
+    # Technical Indicators (RSI, MACD, ATR, Stochastic in one pass)
+    rsi, macd_hist, macd_hist_prev, atr, stoch_k, stoch_d = compute_all_indicators(close, high, low)
     
-    # Volume Analysis
-    volume_signal, volume_ratio, volume_desc, volume_trend = analyze_volume(df)
+    # Shared latest-bar indicators for SL risk, momentum and upside scoring (RSI/MACD from above)
+    snapshot = get_indicator_snapshot(df['Close'], latest=(rsi, macd_hist, macd_hist_prev))
     
-    # Support/Resistance
-    sr_levels = find_support_resistance(df)
+    # Neutral defaults where there were not enough bars (RSI/Stochastic 50, MACD 0)
+    latest = np.array([rsi, macd_hist, stoch_k, stoch_d])
+    rsi, macd_hist, stoch_k, stoch_d = np.where(np.isnan(latest), INDICATOR_NAN_DEFAULTS, latest).tolist()
+    macd_signal = "BULLISH" if macd_hist > 0 else "BEARISH"
+    
+    # Volume Analysis
+    volume_analysis = analyze_volume_arrays(close, volume)
+    volume_signal, volume_ratio, volume_desc, volume_trend = volume_analysis
     
     # SL Risk Prediction
     sl_risk, sl_reasons, sl_recommendation, sl_priority = predict_sl_risk(
-        df, current_price, stop_loss, position_type, entry_price, sl_alert_threshold
+        df, current_price, stop_loss, position_type, entry_price, sl_alert_threshold,
+        snapshot=snapshot, volume=volume_analysis
     )
     
-    # Multi-Timeframe Analysis
-    if enable_mtf:
-        mtf_result = multi_timeframe_analysis(ticker, position_type)
-    else:
-        mtf_result = {
-            'signals': {},
-            'details': {},
-            'alignment_score': 50,
-            'recommendation': "MTF disabled",
-            'aligned_count': 0,
-            'against_count': 0,
-            'total_timeframes': 0,
-            'trend_strength': 'UNKNOWN'
-        }
+    # Stochastic (from the fused kernel above)
+    stoch_k_val, stoch_d_val = stoch_k, stoch_d
     
-    # Check if target hit
-    if position_type == "LONG":
-        target1_hit = current_price >= target1
-        target2_hit = current_price >= target2
-        sl_hit = current_price <= stop_loss
+    # Momentum Score
+    momentum_score, momentum_trend, momentum_components = calculate_momentum_score(df, snapshot=snapshot)
+    
+    # Support/Resistance
+    sr_levels = find_support_resistance_arrays(close, high, low, volume)
+    
+    # Multi-Timeframe Analysis - the only step here that goes to Yahoo, so it is
+    # skipped once SL or target 2 is hit (indicators above still run in full)
+    if not enable_mtf:
+        mtf_result = dict(MTF_DISABLED_RESULT)
+    elif sl_hit or target2_hit:
+        mtf_result = dict(MTF_SKIPPED_RESULT)
     else:
-        target1_hit = current_price <= target1
-        target2_hit = current_price <= target2
-        sl_hit = current_price >= stop_loss
+        mtf_result = multi_timeframe_analysis(ticker, position_type, mtf_universe, daily_df=df,
+                                              mtf_batches=_mtf_batches)
     
     # Upside prediction (if target hit)
     if target1_hit and not sl_hit:
         upside_score, new_target, upside_reasons, upside_rec, upside_action = predict_upside_potential(
-            df, current_price, target1, target2, position_type
+            df, current_price, target1, target2, position_type, snapshot=snapshot,
+            sr_levels=sr_levels, volume=volume_analysis,
+            momentum=(momentum_score, momentum_trend, momentum_components), atr=atr
         )
     else:
         upside_score = 0
@@ -2469,7 +3147,8 @@ def smart_analyze_position(ticker, position_type, entry_price, quantity, stop_lo
     
     # Dynamic Levels
     dynamic_levels = calculate_dynamic_levels(
-        df, entry_price, current_price, stop_loss, position_type, pnl_percent, trail_threshold
+        df, entry_price, current_price, stop_loss, position_type, pnl_percent, trail_threshold,
+        atr=atr, sr_levels=sr_levels
     )
     
     # Partial Exit Tracking
@@ -2491,179 +3170,74 @@ def smart_analyze_position(ticker, position_type, entry_price, quantity, stop_lo
     at_breakeven = breakeven_distance < 0.5 and pnl_percent >= 0
     
     # Distance to SL (for approach warning)
-    if position_type == "LONG":
-        distance_to_sl = ((current_price - stop_loss) / current_price) * 100
-    else:
-        distance_to_sl = ((stop_loss - current_price) / current_price) * 100
+    distance_to_sl = ((direction * (current_price - stop_loss) + 0.0) / current_price) * 100
     
     approaching_sl = distance_to_sl > 0 and distance_to_sl <= sl_approach_threshold
     
     # =========================================================================
     # GENERATE ALERTS AND DETERMINE OVERALL STATUS
     # =========================================================================
-    alerts = []
-    overall_status = 'OK'
-    overall_action = 'HOLD'
-    
-    # Priority 1: SL Hit
-    if sl_hit:
-        alerts.append({
-            'priority': 'CRITICAL',
-            'type': '🚨 STOP LOSS HIT',
-            'message': f'Price ₹{current_price:.2f} breached SL ₹{stop_loss:.2f}',
-            'action': 'EXIT IMMEDIATELY',
-            'email_type': 'critical'
-        })
-        overall_status = 'CRITICAL'
-        overall_action = 'EXIT'
-    
-    # Priority 2: High SL Risk (Early Exit Warning)
-    elif sl_risk >= sl_alert_threshold + 20:
-        alerts.append({
-            'priority': 'CRITICAL',
-            'type': '⚠️ HIGH SL RISK',
-            'message': f'Risk Score: {sl_risk}% - {", ".join(sl_reasons[:2])}',
-            'action': sl_recommendation,
-            'email_type': 'critical'
-        })
-        overall_status = 'CRITICAL'
-        overall_action = 'EXIT_EARLY'
-    
-    # Priority 3: Approaching SL
-    elif approaching_sl:
-        alerts.append({
-            'priority': 'HIGH',
-            'type': '⚠️ APPROACHING SL',
-            'message': f'Only {distance_to_sl:.1f}% away from Stop Loss!',
-            'action': 'Review position - consider early exit',
-            'email_type': 'sl_approach'
-        })
-        if overall_status == 'OK':
-            overall_status = 'WARNING'
-            overall_action = 'WATCH'
-    
-    # Priority 4: Moderate SL Risk
-    elif sl_risk >= sl_alert_threshold:
-        alerts.append({
-            'priority': 'HIGH',
-            'type': '⚠️ MODERATE SL RISK',
-            'message': f'Risk Score: {sl_risk}% - {", ".join(sl_reasons[:2])}',
-            'action': sl_recommendation,
-            'email_type': 'important'
-        })
-        overall_status = 'WARNING'
-        overall_action = 'WATCH'
-    
-    # Priority 5: Target 2 Hit
-    elif target2_hit:
-        alerts.append({
-            'priority': 'HIGH',
-            'type': '🎯 TARGET 2 HIT',
-            'message': f'Both targets achieved! P&L: {pnl_percent:+.2f}%',
-            'action': 'BOOK FULL PROFITS',
-            'email_type': 'target'
-        })
-        overall_status = 'SUCCESS'
-        overall_action = 'BOOK_PROFITS'
-    
-    # Priority 6: Target 1 Hit with Upside Analysis
-    elif target1_hit:
-        if upside_score >= 60:
-            alerts.append({
-                'priority': 'INFO',
-                'type': '🎯 TARGET HIT - HOLD',
-                'message': f'Upside Score: {upside_score}% - {", ".join(upside_reasons[:2])}',
-                'action': f'{upside_action}',
-                'email_type': 'target'
-            })
-            overall_status = 'OPPORTUNITY'
-            overall_action = 'HOLD_EXTEND'
-        else:
-            alerts.append({
-                'priority': 'HIGH',
-                'type': '🎯 TARGET HIT - EXIT',
-                'message': f'Limited upside ({upside_score}%). Book profits.',
-                'action': 'BOOK PROFITS',
-                'email_type': 'target'
-            })
-            overall_status = 'SUCCESS'
-            overall_action = 'BOOK_PROFITS'
-    
-    # Priority 7: Trail Stop Recommendation
-    elif dynamic_levels['should_trail'] and pnl_percent >= trail_threshold:
-        alerts.append({
-            'priority': 'MEDIUM',
-            'type': '📈 TRAIL STOP LOSS',
-            'message': f'{dynamic_levels.get("trail_reason", "Lock profits!")} Move SL from ₹{stop_loss:.2f} to ₹{dynamic_levels["trail_stop"]:.2f}',
-            'action': f'New SL: ₹{dynamic_levels["trail_stop"]:.2f}',
-            'email_type': 'sl_change'
-        })
-        overall_status = 'GOOD'
-        overall_action = 'TRAIL_SL'
-    
-    # Priority 8: MTF Warning
-    elif enable_mtf and mtf_result['alignment_score'] < 40 and pnl_percent < 0:
-        alerts.append({
-            'priority': 'MEDIUM',
-            'type': '📊 MTF WARNING',
-            'message': f'Timeframes against position ({mtf_result["alignment_score"]}% aligned)',
-            'action': mtf_result['recommendation'],
-            'email_type': 'important'
-        })
-        overall_status = 'WARNING'
-        overall_action = 'WATCH'
+    ctx = {
+        'sl_hit': sl_hit,
+        'target1_hit': target1_hit,
+        'target2_hit': target2_hit,
+        'approaching_sl': approaching_sl,
+        'at_breakeven': at_breakeven,
+        'should_trail': dynamic_levels['should_trail'],
+        'enable_mtf': enable_mtf,
+        'sl_risk': sl_risk,
+        'sl_alert_threshold': sl_alert_threshold,
+        'sl_recommendation': sl_recommendation,
+        'upside_score': upside_score,
+        'upside_action': upside_action,
+        'pnl_percent': pnl_percent,
+        'trail_threshold': trail_threshold,
+        'trail_reason': dynamic_levels.get("trail_reason", "Lock profits!"),
+        'trail_stop': dynamic_levels['trail_stop'],
+        'mtf_alignment': mtf_result['alignment_score'],
+        'mtf_recommendation': mtf_result['recommendation'],
+        'distance_to_sl': distance_to_sl,
+        'current_price': current_price,
+        'stop_loss': stop_loss,
+        'entry_price': entry_price
+    }
     
-    # Priority 9: Breakeven Alert
-    elif at_breakeven:
-        alerts.append({
-            'priority': 'LOW',
-            'type': '🔔 BREAKEVEN REACHED',
-            'message': f'Position at breakeven. Consider moving SL to entry (₹{entry_price:.2f})',
-            'action': f'Move SL to ₹{entry_price:.2f} (breakeven)',
-            'email_type': 'important'
-        })
-        if overall_status == 'OK':
-            overall_status = 'GOOD'
-            overall_action = 'MOVE_SL_BREAKEVEN'
+    _, template, overall_status, overall_action = next(
+        (rule for rule in ALERT_RULES if rule[0](ctx)), DEFAULT_ALERT_RULE
+    )
+    alerts = []
+    if template is not None:
+        # Reason summaries are only needed once a rule has fired
+        ctx['sl_reasons_text'] = ", ".join(sl_reasons[:2])
+        ctx['upside_reasons_text'] = ", ".join(upside_reasons[:2])
+        alerts.append(dict(
+            template,
+            message=template['message'].format(**ctx),
+            action=template['action'].format(**ctx)
+        ))
     
     # Priority 10: Partial Exit Alert
     if partial_exits['triggered_count'] > 0 and not target2_hit:
         triggered = [r for r in partial_exits['recommendations'] if r['status'] == 'TRIGGERED']
         if triggered:
             latest = triggered[-1]
-            alerts.append({
-                'priority': 'LOW',
-                'type': '📊 PARTIAL EXIT',
-                'message': f'Level ₹{latest["level"]:.2f} triggered - Book {latest["exit_pct"]}% ({latest["exit_qty"]} shares)',
-                'action': f'Exit {latest["exit_qty"]} shares at ₹{current_price:.2f}',
-                'email_type': 'important'
-            })
+            alerts.append(dict(
+                PARTIAL_EXIT_ALERT,
+                message=PARTIAL_EXIT_ALERT['message'].format(
+                    level=latest['level'], exit_pct=latest['exit_pct'], exit_qty=latest['exit_qty']
+                ),
+                action=PARTIAL_EXIT_ALERT['action'].format(
+                    exit_qty=latest['exit_qty'], current_price=current_price
+                )
+            ))
     
-    # Volume Warning
-    if position_type == "LONG" and volume_signal == "STRONG_SELLING" and sl_risk < sl_alert_threshold:
-        alerts.append({
-            'priority': 'LOW',
-            'type': '📊 VOLUME WARNING',
-            'message': volume_desc,
-            'action': 'Monitor closely',
-            'email_type': 'important'
-        })
-    elif position_type == "SHORT" and volume_signal == "STRONG_BUYING" and sl_risk < sl_alert_threshold:
-        alerts.append({
-            'priority': 'LOW',
-            'type': '📊 VOLUME WARNING',
-            'message': volume_desc,
-            'action': 'Monitor closely',
-            'email_type': 'important'
-        })
+    # Volume Warning (heavy volume against the position)
+    if VOLUME_SIGNAL_PRESSURE.get(volume_signal, 0) == -2 * direction and sl_risk < sl_alert_threshold:
+        alerts.append(dict(VOLUME_WARNING_ALERT, message=volume_desc))
     
     # Calculate Risk-Reward Ratio
-    if position_type == "LONG":
-        risk = entry_price - stop_loss
-        reward = target1 - entry_price
-    else:
-        risk = stop_loss - entry_price
-        reward = entry_price - target1
+    risk = direction * (entry_price - stop_loss) + 0.0
+    reward = direction * (target1 - entry_price) + 0.0
     
     risk_reward_ratio = safe_divide(reward, risk, default=0.0)
     
@@ -2862,8 +3436,8 @@ def validate_portfolio(df):
     if errors:
         return False, errors, warnings
     
-    # Validate each row
-    for idx, row in df.iterrows():
+    # Validate each row (plain dict records - no per-row Series boxing)
+    for idx, row in zip(df.index, df.to_dict('records')):
         ticker = str(row.get('Ticker', f'Row {idx}')).strip()
         
         try:
@@ -2917,6 +3491,18 @@ def validate_portfolio(df):
 # EMAIL ALERT FUNCTIONS
 # ============================================================================
 
+def is_email_enabled(email_settings):
+    """
+    True only when alerts are switched on and sender/password/recipient are all set.
+    Checked before any email HTML is built.
+    """
+    return bool(
+        email_settings.get('enabled', False) and
+        email_settings.get('sender_email') and
+        email_settings.get('sender_password') and
+        email_settings.get('recipient_email')
+    )
+
 def should_send_email(alert, email_settings, result):
     """
     Determine if email should be sent for this alert
@@ -2938,18 +3524,53 @@ def should_send_email(alert, email_settings, result):
     
     return False
 
+# Alert priority -> accent colour for individual alert emails
+PRIORITY_COLORS = {
+    'CRITICAL': '#dc3545',
+    'HIGH': '#ffc107',
+    'MEDIUM': '#17a2b8',
+    'LOW': '#28a745'
+}
+
+# Static email chrome - built once at import, only the timestamp varies per send
+_ALERT_FOOTER_PREFIX = """<!-- Footer -->
+            <div style="background: #f8f9fa; padding: 15px; text-align: center; font-size: 0.9em; color: #666;">
+                <p style="margin: 0;">Smart Portfolio Monitor v6.0</p>
+                <p style="margin: 5px 0 0 0;">"""
+
+_ALERT_FOOTER_SUFFIX = """ IST</p>
+            </div>
+            
+        </div>
+    </body>
+    </html>
+    """
+
+_SUMMARY_HEADER_PREFIX = """
+    <html>
+    <body style="font-family: Arial, sans-serif; padding: 20px; background: #f8f9fa;">
+        <div style="max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden;">
+            
+            <!-- Header -->
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center;">
+                <h1 style="margin: 0;">📊 Portfolio Alert Summary</h1>
+                <p style="margin: 10px 0 0 0;">"""
+
+_SUMMARY_FOOTER = """<!-- Footer -->
+            <div style="background: #f8f9fa; padding: 15px; text-align: center; font-size: 0.9em; color: #666;">
+                <p style="margin: 0;">Smart Portfolio Monitor v6.0</p>
+            </div>
+            
+        </div>
+    </body>
+    </html>
+    """
+
 def create_alert_email_html(result, alert):
     """
     Create HTML content for alert email
     """
-    status_colors = {
-        'CRITICAL': '#dc3545',
-        'HIGH': '#ffc107',
-        'MEDIUM': '#17a2b8',
-        'LOW': '#28a745'
-    }
-    
-    priority_color = status_colors.get(alert['priority'], '#6c757d')
+    priority_color = PRIORITY_COLORS.get(alert['priority'], '#6c757d')
     pnl_color = '#28a745' if result['pnl_percent'] >= 0 else '#dc3545'
     
     html = f"""
@@ -3016,18 +3637,27 @@ def create_alert_email_html(result, alert):
                 
             </div>
             
-            <!-- Footer -->
-            <div style="background: #f8f9fa; padding: 15px; text-align: center; font-size: 0.9em; color: #666;">
-                <p style="margin: 0;">Smart Portfolio Monitor v6.0</p>
-                <p style="margin: 5px 0 0 0;">{get_ist_now().strftime('%Y-%m-%d %H:%M:%S')} IST</p>
-            </div>
-            
-        </div>
-    </body>
-    </html>
-    """
+            """
     
-    return html
+    return html + _ALERT_FOOTER_PREFIX + f"{get_ist_now():%Y-%m-%d %H:%M:%S}" + _ALERT_FOOTER_SUFFIX
+
+# Per-position cards in the summary email - filled with str.format per result
+_SUMMARY_CRITICAL_CARD = """
+            <div style="background:#f8d7da; padding:15px; margin:10px 0; border-radius:8px; border-left:4px solid #dc3545;">
+                <h3 style="margin:0; color:#721c24;">{ticker} - {action_label}</h3>
+                <p style="margin:5px 0;">Position: {position_type} | P&L: {pnl_percent:+.2f}%</p>
+                <p style="margin:5px 0;">SL Risk: {sl_risk}% | Current: ₹{current_price:,.2f}</p>
+                <p style="margin:5px 0; font-weight:bold;">⚡ {next_step}</p>
+            </div>
+            """
+
+_SUMMARY_WARNING_CARD = """
+            <div style="background:#fff3cd; padding:15px; margin:10px 0; border-radius:8px; border-left:4px solid #ffc107;">
+                <h3 style="margin:0; color:#856404;">{ticker} - {action_label}</h3>
+                <p style="margin:5px 0;">Position: {position_type} | P&L: {pnl_percent:+.2f}%</p>
+                <p style="margin:5px 0;">SL Risk: {sl_risk}%</p>
+            </div>
+            """
 
 def create_summary_email_html(results, critical_count, warning_count, portfolio_risk):
     """
@@ -3035,43 +3665,26 @@ def create_summary_email_html(results, critical_count, warning_count, portfolio_
     """
     ist_now = get_ist_now()
     
-    # Build critical alerts section
-    critical_html = ""
-    for r in results:
-        if r['overall_status'] == 'CRITICAL':
-            critical_html += f"""
-            <div style="background:#f8d7da; padding:15px; margin:10px 0; border-radius:8px; border-left:4px solid #dc3545;">
-                <h3 style="margin:0; color:#721c24;">{r['ticker']} - {r['overall_action'].replace('_', ' ')}</h3>
-                <p style="margin:5px 0;">Position: {r['position_type']} | P&L: {r['pnl_percent']:+.2f}%</p>
-                <p style="margin:5px 0;">SL Risk: {r['sl_risk']}% | Current: ₹{r['current_price']:,.2f}</p>
-                <p style="margin:5px 0; font-weight:bold;">⚡ {r['alerts'][0]['action'] if r['alerts'] else 'Review immediately'}</p>
-            </div>
-            """
+    # Build critical alerts section (collect parts, join once)
+    critical_html = "".join(
+        _SUMMARY_CRITICAL_CARD.format(
+            action_label=r['overall_action'].replace('_', ' '),
+            next_step=r['alerts'][0]['action'] if r['alerts'] else 'Review immediately',
+            **r
+        )
+        for r in results if r['overall_status'] == 'CRITICAL'
+    )
     
     # Build warning alerts section
-    warning_html = ""
-    for r in results:
-        if r['overall_status'] == 'WARNING':
-            warning_html += f"""
-            <div style="background:#fff3cd; padding:15px; margin:10px 0; border-radius:8px; border-left:4px solid #ffc107;">
-                <h3 style="margin:0; color:#856404;">{r['ticker']} - {r['overall_action'].replace('_', ' ')}</h3>
-                <p style="margin:5px 0;">Position: {r['position_type']} | P&L: {r['pnl_percent']:+.2f}%</p>
-                <p style="margin:5px 0;">SL Risk: {r['sl_risk']}%</p>
-            </div>
-            """
+    warning_html = "".join(
+        _SUMMARY_WARNING_CARD.format(action_label=r['overall_action'].replace('_', ' '), **r)
+        for r in results if r['overall_status'] == 'WARNING'
+    )
     
-    total_pnl = sum(r['pnl_amount'] for r in results)
+    total_pnl = portfolio_risk['total_pnl']
     pnl_color = '#28a745' if total_pnl >= 0 else '#dc3545'
     
-    html = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; padding: 20px; background: #f8f9fa;">
-        <div style="max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden;">
-            
-            <!-- Header -->
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center;">
-                <h1 style="margin: 0;">📊 Portfolio Alert Summary</h1>
-                <p style="margin: 10px 0 0 0;">{ist_now.strftime('%Y-%m-%d %H:%M:%S')} IST</p>
+    html = _SUMMARY_HEADER_PREFIX + f"{ist_now:%Y-%m-%d %H:%M:%S}" + f""" IST</p>
             </div>
             
             <!-- Summary Stats -->
@@ -3101,68 +3714,72 @@ def create_summary_email_html(results, critical_count, warning_count, portfolio_
             <!-- Warning Alerts -->
             {f'<div style="padding: 20px;"><h2 style="color: #ffc107;">⚠️ Warnings</h2>{warning_html}</div>' if warning_html else ''}
             
-            <!-- Footer -->
-            <div style="background: #f8f9fa; padding: 15px; text-align: center; font-size: 0.9em; color: #666;">
-                <p style="margin: 0;">Smart Portfolio Monitor v6.0</p>
-            </div>
-            
-        </div>
-    </body>
-    </html>
-    """
+            """
     
-    return html
+    return html + _SUMMARY_FOOTER
 
-def send_portfolio_alerts(results, email_settings, portfolio_risk):
+def send_portfolio_alerts(results, email_settings, portfolio_risk, critical_count=None, warning_count=None):
     """
     Send email alerts for portfolio positions
+    critical_count/warning_count: pass the dashboard's status counts to skip recounting
     """
-    if not email_settings.get('enabled', False):
+    if not is_email_enabled(email_settings):
         return
     
-    sender = email_settings.get('sender_email', '')
-    password = email_settings.get('sender_password', '')
-    recipient = email_settings.get('recipient_email', '')
+    sender = email_settings['sender_email']
+    password = email_settings['sender_password']
+    recipient = email_settings['recipient_email']
     cooldown = email_settings.get('cooldown', 15)
     
-    if not sender or not password or not recipient:
-        return
-    
     # Count alerts
-    critical_count = sum(1 for r in results if r['overall_status'] == 'CRITICAL')
-    warning_count = sum(1 for r in results if r['overall_status'] == 'WARNING')
+    if critical_count is None:
+        critical_count = sum(1 for r in results if r['overall_status'] == 'CRITICAL')
+    if warning_count is None:
+        warning_count = sum(1 for r in results if r['overall_status'] == 'WARNING')
+    
+    # Every email goes out in one concurrent batch - job_info: (alert_hash, sent log, failure log)
+    jobs = []
+    job_info = []
+    today = f"{get_ist_now():%Y%m%d}"  # one date stamp for every alert hash in this batch
     
-    # Send summary email for critical alerts
+    # Summary email for critical alerts
     if critical_count > 0:
-        alert_hash = generate_alert_hash("PORTFOLIO", "SUMMARY_CRITICAL", str(critical_count))
+        alert_hash = generate_alert_hash("PORTFOLIO", "SUMMARY_CRITICAL", str(critical_count), today)
         
         if can_send_email(alert_hash, cooldown):
             subject = f"🚨 CRITICAL: {critical_count} positions need attention!"
-            html = create_summary_email_html(results, critical_count, warning_count, portfolio_risk)
-            
-            success, msg = send_email_alert(subject, html, sender, password, recipient)
-            if success:
-                mark_email_sent(alert_hash)
-                log_email(f"Summary email sent: {critical_count} critical, {warning_count} warning")
-            else:
-                log_email(f"Summary email failed: {msg}")
+            jobs.append((subject, create_summary_email_html(results, critical_count, warning_count, portfolio_risk)))
+            job_info.append((
+                alert_hash,
+                f"Summary email sent: {critical_count} critical, {warning_count} warning",
+                "Summary email failed"
+            ))
     
-    # Send individual alerts for specific conditions
+    # Individual alerts for specific conditions
+    queued_hashes = set()
     for result in results:
         for alert in result['alerts']:
             if should_send_email(alert, email_settings, result):
-                alert_hash = generate_alert_hash(result['ticker'], alert['type'], str(result['current_price']))
+                alert_hash = generate_alert_hash(result['ticker'], alert['type'], str(result['current_price']), today)
                 
-                if can_send_email(alert_hash, cooldown):
+                if alert_hash not in queued_hashes and can_send_email(alert_hash, cooldown):
+                    queued_hashes.add(alert_hash)
                     subject = f"{alert['type']} - {result['ticker']}"
-                    html = create_alert_email_html(result, alert)
-                    
-                    success, msg = send_email_alert(subject, html, sender, password, recipient)
-                    if success:
-                        mark_email_sent(alert_hash)
-                        log_email(f"Alert sent: {result['ticker']} - {alert['type']}")
-                    else:
-                        log_email(f"Alert failed for {result['ticker']}: {msg}")
+                    jobs.append((subject, create_alert_email_html(result, alert)))
+                    job_info.append((
+                        alert_hash,
+                        f"Alert sent: {result['ticker']} - {alert['type']}",
+                        f"Alert failed for {result['ticker']}"
+                    ))
+    
+    # Cooldown bookkeeping stays on the script thread once the batch is back
+    outcomes = send_email_alerts_batch(jobs, sender, password, recipient)
+    for (alert_hash, sent_log, failed_log), (success, msg) in zip(job_info, outcomes):
+        if success:
+            mark_email_sent(alert_hash)
+            log_email(sent_log)
+        else:
+            log_email(f"{failed_log}: {msg}")
 # ============================================================================
 # SIDEBAR CONFIGURATION
 # ============================================================================
@@ -3257,7 +3874,7 @@ def render_sidebar():
                                     color: white; padding: 20px; border-radius: 10px; text-align: center;">
                             <h1>✅ Test Email Successful!</h1>
                             <p>Your email configuration is working correctly.</p>
-                            <p>Time: {get_ist_now().strftime('%Y-%m-%d %H:%M:%S')} IST</p>
+                            <p>Time: {get_ist_now():%Y-%m-%d %H:%M:%S} IST</p>
                         </div>
                         <div style="padding: 20px; background: #f8f9fa; margin-top: 15px; border-radius: 10px;">
                             <p>You will receive alerts for:</p>
@@ -3575,9 +4192,9 @@ def render_sidebar():
                     st.rerun()
             
             if st.button("🗑️ Reset Email Log", use_container_width=True, key="reset_email"):
-                st.session_state.email_log = []
-                st.session_state.email_sent_alerts = {}
-                st.session_state.last_email_time = {}
+                st.session_state.email_log = deque(maxlen=50)
+                st.session_state.email_sent_alerts = OrderedDict()
+                st.session_state.last_email_time = OrderedDict()
                 st.success("✅ Email log reset!")
         # =====================================================================
         # DEBUG INFO
@@ -3599,7 +4216,7 @@ def render_sidebar():
                         # Email log
             if st.session_state.email_log:
                 st.markdown("**Recent Email Log:**")
-                for log_entry in st.session_state.email_log[-5:]:
+                for log_entry in list(st.session_state.email_log)[-5:]:
                     st.caption(log_entry)
                 
                 # Download button for full log
@@ -3826,6 +4443,7 @@ def display_sector_analysis(sector_analysis):
         
         df_sector = pd.DataFrame(sector_data)
         
+        import plotly.express as px  # Lazy import - keeps plotly off the cold-start path
         fig = px.pie(
             df_sector,
             values='Percentage',
@@ -3908,6 +4526,7 @@ def display_correlation_analysis(results, enable_correlation):
         
         with col1:
             # Heatmap
+            import plotly.express as px  # Lazy import - keeps plotly off the cold-start path
             fig = px.imshow(
                 corr_matrix,
                 labels=dict(x="Stock", y="Stock", color="Correlation"),
@@ -3943,11 +4562,41 @@ def display_correlation_analysis(results, enable_correlation):
 # MAIN APPLICATION
 # ============================================================================
 
+# Positions analysed concurrently - each one is mostly waiting on Yahoo
+ANALYSIS_WORKERS = 4
+
+# Dashboard lookups - shared by every position row
+STATUS_ORDER = {'CRITICAL': 0, 'WARNING': 1, 'OPPORTUNITY': 2, 'SUCCESS': 3, 'GOOD': 4, 'OK': 5}
+STATUS_ICONS = {
+    'CRITICAL': '🔴', 'WARNING': '🟡', 'OPPORTUNITY': '🔵',
+    'SUCCESS': '🟢', 'GOOD': '🟢', 'OK': '⚪'
+}
+RECOMMENDATION_BOX_CLASSES = {
+    'EXIT': 'critical-box', 'EXIT_EARLY': 'critical-box',
+    'WATCH': 'warning-box', 'BOOK_PROFITS': 'success-box',
+    'HOLD_EXTEND': 'info-box', 'TRAIL_SL': 'success-box',
+    'HOLD': 'info-box', 'MOVE_SL_BREAKEVEN': 'info-box'
+}
+
+@st.cache_resource
+def warm_up_kernels():
+    """Compile the numba kernels once per server process, not on the first portfolio row"""
+    if not HAS_NUMBA:
+        return
+    prices = np.linspace(100.0, 110.0, 64)
+    _latest_rsi_macd(prices)
+    _wilder(prices, 14)
+    _last_ema(prices, 9)
+    compute_all_indicators(prices, prices + 1.0, prices - 1.0)
+    _cluster_levels(prices, np.ones_like(prices))
+
 def main():
     """
     Main application entry point
     """
     
+    warm_up_kernels()
+    
     # Header
     st.markdown('<h1 class="main-header">🧠 Smart Portfolio Monitor v6.0</h1>', unsafe_allow_html=True)
     
@@ -4114,15 +4763,30 @@ def main():
     results = []
     progress_bar = st.progress(0, text="Analyzing positions...")
     
-    for i, (_, row) in enumerate(portfolio.iterrows()):
-        ticker = str(row['Ticker']).strip()
-        progress_bar.progress((i + 0.5) / len(portfolio), text=f"Analyzing {ticker}...")
-        
-        # Get entry date if available
-        entry_date = row.get('Entry_Date', None)
+    # All MTF symbols - bars for the whole portfolio come from one download per timeframe
+    mtf_universe = None
+    if settings['enable_multi_timeframe']:
+        mtf_universe = tuple(sorted({mtf_symbol(str(t).strip()) for t in portfolio['Ticker']}))
+    
+    positions = portfolio.to_dict('records')
+    
+    # Daily history for the whole portfolio in one download
+    price_history = fetch_portfolio_history(
+        tuple(sorted({str(row['Ticker']).strip() for row in positions})),
+        cache_bucket=market_cache_bucket(PRICE_REFRESH_SECONDS)
+    )
+    
+    # Weekly/hourly MTF bars for the whole portfolio - downloaded here, before the
+    # worker pool starts, so workers only read them
+    mtf_batches = prefetch_mtf_batches(mtf_universe) if mtf_universe else None
+    script_ctx = get_script_run_ctx() if HAS_SCRIPT_RUN_CTX else None
+    
+    def analyze_row(row):
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
         
-        result = smart_analyze_position(
-            ticker,
+        return smart_analyze_position(
+            str(row['Ticker']).strip(),
             str(row['Position']).upper().strip(),
             float(row['Entry_Price']),
             int(row.get('Quantity', 1)),
@@ -4133,16 +4797,37 @@ def main():
             settings['sl_risk_threshold'],
             settings['sl_approach_threshold'],
             settings['enable_multi_timeframe'],
-            entry_date
+            row.get('Entry_Date', None),
+            mtf_universe,
+            price_history.get(str(row['Ticker']).strip()),
+            mtf_batches
         )
-        
-        if result:
-            results.append(result)
-        
-        progress_bar.progress((i + 1) / len(portfolio), text=f"Completed {ticker}")
     
+    # Positions are independent - overlap their fetches, keep results in sheet order
+    analyzed = [None] * len(positions)
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(ANALYSIS_WORKERS, len(positions)) or 1) as executor:
+        futures = {executor.submit(analyze_row, row): i for i, row in enumerate(positions)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            ticker = str(positions[i]['Ticker']).strip()
+            
+            # One bad position must not take down the whole dashboard
+            try:
+                analyzed[i] = future.result()
+            except Exception as e:
+                logger.error(f"Analysis failed for {ticker}: {str(e)}")
+                failed.append(ticker)
+            
+            # One frontend update per position (from the script thread)
+            progress_bar.progress(done / len(positions), text=f"Analyzed {ticker} ({done}/{len(positions)})")
+    
+    results = [result for result in analyzed if result]
     progress_bar.empty()
     
+    if failed:
+        st.warning(f"⚠️ Could not analyze: {', '.join(failed)}")
+    
     if not results:
         st.error("❌ Could not fetch stock data. Check internet connection and try again.")
         return
@@ -4160,22 +4845,27 @@ def main():
     # Update drawdown
     update_drawdown(portfolio_risk['current_value'])
     
-    # Summary counts
-    total_pnl = sum(r['pnl_amount'] for r in results)
-    total_invested = sum(r['entry_price'] * r['quantity'] for r in results)
+    # Summary counts (one pass - only the columns we need, never the price history)
+    summary_df = pd.DataFrame(results, columns=['overall_status', 'pnl_amount', 'entry_price', 'quantity'])
+    total_pnl = float(summary_df['pnl_amount'].sum())
+    total_invested = float((summary_df['entry_price'] * summary_df['quantity']).sum())
     pnl_percent_total = (total_pnl / total_invested * 100) if total_invested > 0 else 0
     
-    critical_count = sum(1 for r in results if r['overall_status'] == 'CRITICAL')
-    warning_count = sum(1 for r in results if r['overall_status'] == 'WARNING')
-    opportunity_count = sum(1 for r in results if r['overall_status'] == 'OPPORTUNITY')
-    success_count = sum(1 for r in results if r['overall_status'] == 'SUCCESS')
-    good_count = sum(1 for r in results if r['overall_status'] == 'GOOD')
+    status_counts = summary_df['overall_status'].value_counts()
+    critical_count = int(status_counts.get('CRITICAL', 0))
+    warning_count = int(status_counts.get('WARNING', 0))
+    opportunity_count = int(status_counts.get('OPPORTUNITY', 0))
+    success_count = int(status_counts.get('SUCCESS', 0))
+    good_count = int(status_counts.get('GOOD', 0))
     
     # =========================================================================
     # SEND EMAIL ALERTS
     # =========================================================================
-    if settings['email_settings']['enabled']:
-        send_portfolio_alerts(results, settings['email_settings'], portfolio_risk)
+    if is_email_enabled(settings['email_settings']):
+        send_portfolio_alerts(
+            results, settings['email_settings'], portfolio_risk,
+            critical_count=critical_count, warning_count=warning_count
+        )
     
     # =========================================================================
     # DISPLAY SUMMARY CARDS
@@ -4219,15 +4909,10 @@ def main():
     # =========================================================================
     with tab1:
         # Sort by status priority
-        status_order = {'CRITICAL': 0, 'WARNING': 1, 'OPPORTUNITY': 2, 'SUCCESS': 3, 'GOOD': 4, 'OK': 5}
-        sorted_results = sorted(results, key=lambda x: status_order.get(x['overall_status'], 5))
+        sorted_results = sorted(results, key=lambda x: STATUS_ORDER.get(x['overall_status'], 5))
         
         for r in sorted_results:
-            status_icons = {
-                'CRITICAL': '🔴', 'WARNING': '🟡', 'OPPORTUNITY': '🔵',
-                'SUCCESS': '🟢', 'GOOD': '🟢', 'OK': '⚪'
-            }
-            status_icon = status_icons.get(r['overall_status'], '⚪')
+            status_icon = STATUS_ICONS.get(r['overall_status'], '⚪')
             pnl_emoji = "📈" if r['pnl_percent'] >= 0 else "📉"
             
             with st.expander(
@@ -4446,13 +5131,7 @@ def main():
                             st.caption(f"ℹ️ {alert['type']}: {alert['message']}")
                 
                 # Recommendation Box
-                rec_colors = {
-                    'EXIT': 'critical-box', 'EXIT_EARLY': 'critical-box',
-                    'WATCH': 'warning-box', 'BOOK_PROFITS': 'success-box',
-                    'HOLD_EXTEND': 'info-box', 'TRAIL_SL': 'success-box',
-                    'HOLD': 'info-box', 'MOVE_SL_BREAKEVEN': 'info-box'
-                }
-                rec_class = rec_colors.get(r['overall_action'], 'info-box')
+                rec_class = RECOMMENDATION_BOX_CLASSES.get(r['overall_action'], 'info-box')
                 
                 st.markdown(f"""
                 <div class="{rec_class}">
@@ -4470,6 +5149,8 @@ def main():
         if selected_result and 'df' in selected_result:
             df = selected_result['df']
             
+            import plotly.graph_objects as go  # Lazy import - keeps plotly off the cold-start path
+            
             # Candlestick Chart
             fig = go.Figure()
             
@@ -4534,7 +5215,7 @@ def main():
             
             with col2:
                 macd, signal, histogram = calculate_macd(df['Close'])
-                colors = ['green' if h >= 0 else 'red' for h in histogram]
+                colors = np.where(histogram.to_numpy() >= 0, 'green', 'red')
                 fig_macd = go.Figure()
                 fig_macd.add_trace(go.Bar(x=df['Date'], y=histogram, name='Histogram',
                                          marker_color=colors))
@@ -4547,8 +5228,7 @@ def main():
             
             # Volume Chart
             fig_vol = go.Figure()
-            vol_colors = ['green' if df['Close'].iloc[i] >= df['Open'].iloc[i] else 'red'
-                         for i in range(len(df))]
+            vol_colors = np.where(df['Close'].to_numpy() >= df['Open'].to_numpy(), 'green', 'red')
             fig_vol.add_trace(go.Bar(x=df['Date'], y=df['Volume'], name='Volume',
                                     marker_color=vol_colors))
             fig_vol.update_layout(title="Volume", height=200)
@@ -4622,8 +5302,9 @@ def main():
             st.warning("⚠️ Multi-Timeframe Analysis is disabled. Enable it in the sidebar settings.")
         else:
             for r in results:
-                with st.expander(f"{r['ticker']} - MTF Alignment: {r['mtf_alignment']}%",
-                                expanded=(r['mtf_alignment'] < 50)):
+                alignment_label = f"{r['mtf_alignment']}%" if r['mtf_signals'] else "N/A"
+                with st.expander(f"{r['ticker']} - MTF Alignment: {alignment_label}",
+                                expanded=bool(r['mtf_signals']) and r['mtf_alignment'] < 50):
                     
                     if r['mtf_signals']:
                         col1, col2 = st.columns([1, 2])
@@ -4653,7 +5334,7 @@ def main():
                                 MACD: {'📈' if details.get('macd_bullish') else '📉'}
                                 """)
                     else:
-                        st.warning("MTF data not available for this stock")
+                        st.warning(f"MTF data not available for this stock ({r['mtf_recommendation']})")
     
     # =========================================================================
     # TAB 5: PORTFOLIO RISK
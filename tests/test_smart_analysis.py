@@ -0,0 +1,87 @@
+"""
+Regression tests for smart_analyze_position's multi-timeframe skip.
+Run with: python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("yfinance")
+pytest.importorskip("numba")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import app  # noqa: E402
+
+
+def make_history(n=126, seed=0, last_close=100.0):
+    """6mo-style daily history ending at last_close, shaped like fetch_portfolio_history output"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    close *= last_close / close[-1]
+    return pd.DataFrame({
+        'Date': pd.date_range('2026-01-01', periods=n, freq='B'),
+        'Open': close * (1 + rng.normal(0, 0.005, n)),
+        'High': close * (1 + rng.uniform(0, 0.01, n)),
+        'Low': close * (1 - rng.uniform(0, 0.01, n)),
+        'Close': close,
+        'Volume': rng.integers(100_000, 1_000_000, n),
+    })
+
+
+@pytest.fixture
+def mtf_calls(monkeypatch):
+    """Record multi_timeframe_analysis calls instead of going to Yahoo"""
+    calls = []
+
+    def fake_mtf(ticker, position_type, *args, **kwargs):
+        calls.append(ticker)
+        return dict(app.MTF_DISABLED_RESULT, recommendation="stub")
+
+    monkeypatch.setattr(app, "multi_timeframe_analysis", fake_mtf)
+    app.smart_analyze_position.clear()
+    yield calls
+    app.smart_analyze_position.clear()
+
+
+def analyze(ticker, stop_loss, target1, target2, position_type="LONG"):
+    return app.smart_analyze_position(
+        ticker, position_type, 100.0, 10, stop_loss, target1, target2,
+        enable_mtf=True, _price_data=make_history()
+    )
+
+
+@pytest.mark.parametrize("ticker,position_type,stop_loss,target1,target2", [
+    ("SLHIT", "LONG", 100.0, 110.0, 120.0),      # price exactly at SL
+    ("T2HIT", "LONG", 80.0, 90.0, 95.0),         # past target 2
+    ("SHORTSL", "SHORT", 99.0, 90.0, 80.0),      # short stopped out
+])
+def test_terminal_positions_skip_mtf_fetch(mtf_calls, ticker, position_type, stop_loss, target1, target2):
+    result = analyze(ticker, stop_loss, target1, target2, position_type)
+
+    assert result is not None
+    assert mtf_calls == []
+    assert result['mtf_recommendation'] == app.MTF_SKIPPED_RESULT['recommendation']
+    assert result['sl_hit'] or result['target2_hit']
+    # Indicators still computed in full for terminal rows
+    assert result['sl_reasons'] is not None
+    assert result['momentum_components']
+
+
+def test_live_position_runs_mtf(mtf_calls):
+    result = analyze("LIVE", 90.0, 110.0, 120.0)
+
+    assert mtf_calls == ["LIVE"]
+    assert result['mtf_recommendation'] == "stub"
+
+
+def test_at_risk_position_still_runs_mtf(mtf_calls):
+    # 0.5% above SL - approaching, not hit. The MTF emergency check needs real data here
+    result = analyze("ATRISK", 99.5, 110.0, 120.0)
+
+    assert not result['sl_hit']
+    assert result['approaching_sl']
+    assert mtf_calls == ["ATRISK"]